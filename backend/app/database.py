@@ -1,5 +1,6 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./timetable.db")
@@ -10,6 +11,9 @@ engine = create_engine(DATABASE_URL, echo=False, future=True, connect_args=conne
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 Base = declarative_base()
 
+# (table, column) added to a table that older databases already have; see init_db
+ADDED_COLUMNS = [("rooms", "preferred_for"), ("divisions", "strength"), ("timetables", "grid_version")]
+
 
 def get_db():
     db = SessionLocal()
@@ -36,4 +40,22 @@ def init_db():
             # batches table
             tables = [row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type='table'").fetchall()]
             if "batches" not in tables:
-                Base.metadata.create_all(bind=engine)  # ensure Batch is created
\ No newline at end of file
+                Base.metadata.create_all(bind=engine)  # ensure Batch is created
+            conn.commit()
+    # columns and indexes declared after a table was first created: create_all skips existing
+    # tables, so add any the database lacks, on SQLite and MySQL alike
+    with engine.begin() as conn:
+        existing = inspect(conn)
+        for table_name, column_name in ADDED_COLUMNS:
+            if column_name in {c["name"] for c in existing.get_columns(table_name)}:
+                continue
+            column = Base.metadata.tables[table_name].c[column_name]
+            conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}")
+            if column_name == "preferred_for":
+                # seeded with the room numbers the allocator used to hardcode
+                conn.exec_driver_sql("UPDATE rooms SET preferred_for = 'lab' WHERE room_number IN ('103', '104')")
+                conn.exec_driver_sql("UPDATE rooms SET preferred_for = 'tutorial' WHERE room_number = '105'")
+                conn.exec_driver_sql("UPDATE rooms SET preferred_for = 'lecture' WHERE room_number IN ('101', '102')")
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
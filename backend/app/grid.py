@@ -0,0 +1,145 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import models
+from .render import encode
+from .solver.loader import grid_size, load_time_config
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+DEFAULT_PERIODS = 8
+
+# rendered grids kept per process; 0 disables the cache
+GRID_CACHE_SIZE = int(os.getenv("GRID_CACHE_SIZE", "512"))
+# also keep rendered grids in the timetable_grids table, shared by every server process
+GRID_CACHE_PERSIST = os.getenv("GRID_CACHE_PERSIST", "0") in ("1", "true")
+
+
+def build_grid(db: Session, tt_id: int) -> dict:
+    # Build empty grid of the timetable's periods per day (DEFAULT_PERIODS when it does not exist)
+    tt = db.get(models.Timetable, tt_id)
+    periods = grid_size(load_time_config(db, tt.class_id, tt.department_id))[1] if tt else DEFAULT_PERIODS
+    grid = {day: {str(p): {} for p in range(periods)} for day in DAYS}
+    entries = db.query(models.TimetableEntry).filter(models.TimetableEntry.timetable_id == tt_id).all()
+
+    # Preload related entities for names
+    subject_ids = {e.subject_id for e in entries}
+    teacher_ids = {e.teacher_id for e in entries}
+    room_ids = {e.room_id for e in entries if e.room_id}
+    division_ids = {e.division_id for e in entries}
+
+    subjects = {s.id: s for s in db.query(models.Subject).filter(models.Subject.id.in_(subject_ids)).all()} if subject_ids else {}
+    teachers = {t.id: t for t in db.query(models.Teacher).filter(models.Teacher.id.in_(teacher_ids)).all()} if teacher_ids else {}
+    rooms = {r.id: r for r in db.query(models.Room).filter(models.Room.id.in_(room_ids)).all()} if room_ids else {}
+    divisions = {d.id: d for d in db.query(models.Division).filter(models.Division.id.in_(division_ids)).all()} if division_ids else {}
+
+    # Map entries into grid with names so UI doesn't show N/A; batches running side by side share
+    # a cell: the first batch fills it and all of them are listed under "batches"
+    for e in sorted(entries, key=lambda e: e.batch_number or 0):
+        day = DAYS[e.day_index]
+        subj = subjects.get(e.subject_id)
+        teach = teachers.get(e.teacher_id)
+        room = rooms.get(e.room_id) if e.room_id else None
+        div = divisions.get(e.division_id)
+        cell = {
+            "subject": {"id": e.subject_id, "name": subj.name if subj else None},
+            "teacher": {"id": e.teacher_id, "name": teach.name if teach else None},
+            "room": ({"id": e.room_id, "room_number": room.room_number, "floor": room.floor, "type": room.type.value} if room else {"id": None, "room_number": "-"}),
+            "division": {"id": e.division_id, "name": div.name if div else None},
+            "batch": {"number": e.batch_number} if e.batch_number else None,
+        }
+        # setdefault: the time config may have shrunk since the entry was generated
+        current = grid[day].setdefault(str(e.period_index), {})
+        if e.batch_number and current.get("batch"):
+            current["batches"].append(cell)
+            continue
+        if e.batch_number:
+            cell["batches"] = [dict(cell)]
+        grid[day][str(e.period_index)] = cell
+    return {"days": DAYS, "grid": grid}
+
+
+class GridCache:
+    """Rendered grid JSON per timetable, least recently used evicted first.
+
+    Entries are keyed by the timetable's ``grid_tag``: every write that changes
+    what the grid shows bumps ``grid_version``, so a stale entry is simply
+    never asked for again, in this process or any other.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._items: "OrderedDict[int, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tt_id: int, tag: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._items.get(tt_id)
+            if item is None or item[0] != tag:
+                return None
+            self._items.move_to_end(tt_id)
+            return item[1]
+
+    def put(self, tt_id: int, tag: str, body: bytes):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._items[tt_id] = (tag, body)
+            self._items.move_to_end(tt_id)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def drop(self, tt_id: int):
+        with self._lock:
+            self._items.pop(tt_id, None)
+
+
+_cache = GridCache(GRID_CACHE_SIZE)
+
+
+def grid_tag(tt: models.Timetable) -> str:
+    # the creation time keeps a reused id (SQLite hands out a deleted maximum again) from matching
+    created = int(tt.created_at.timestamp()) if tt.created_at else 0
+    return f"{tt.id}-{tt.grid_version or 0}-{created}"
+
+
+def rendered_grid(db: Session, tt: models.Timetable) -> Tuple[str, bytes]:
+    # (tag, grid JSON bytes) of a timetable: from this process, then the shared table, else built
+    tag = grid_tag(tt)
+    body = _cache.get(tt.id, tag)
+    if body is not None:
+        return tag, body
+    G = models.TimetableGrid
+    if GRID_CACHE_PERSIST:
+        row = db.get(G, tt.id)
+        if row is not None and row.tag == tag:
+            _cache.put(tt.id, tag, row.body)
+            return tag, row.body
+    body = encode(build_grid(db, tt.id))
+    _cache.put(tt.id, tag, body)
+    if GRID_CACHE_PERSIST:
+        try:
+            with db.begin_nested():
+                db.merge(G(timetable_id=tt.id, tag=tag, body=body))
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # another process stored it first
+    return tag, body
+
+
+def touch_grids(db: Session, **where):
+    # bump grid_version of every timetable with an entry matching `where` (e.g. room_id=3),
+    # in the caller's transaction: their grids show a name that is about to change
+    E, T = models.TimetableEntry, models.Timetable
+    ids = select(E.timetable_id).where(*(getattr(E, k) == v for k, v in where.items())).distinct()
+    db.execute(update(T).where(T.id.in_(ids)).values(grid_version=func.coalesce(T.grid_version, 0) + 1)
+               .execution_options(synchronize_session=False))
+
+
+def drop_grid(db: Session, tt_id: int):
+    # a deleted timetable: forget its rendered grid here and in the shared table
+    _cache.drop(tt_id)
+    db.execute(delete(models.TimetableGrid).where(models.TimetableGrid.timetable_id == tt_id))
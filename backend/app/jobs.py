@@ -0,0 +1,113 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Optional
+from . import models, schemas
+from .database import SessionLocal
+from .solver.pipeline import GenerationCancelled, generate_timetables
+from .solver.precheck import InfeasibleInput
+
+SOLVER_WORKERS = int(os.getenv("SOLVER_WORKERS", "0")) or os.cpu_count() or 1
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    # spawn, not fork: uvicorn's threads and pooled DB connections must not leak into workers
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=SOLVER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def submit_job(job_id: int):
+    get_executor().submit(run_job, job_id)
+
+
+def recover_jobs():
+    # on startup: requeue jobs that never started, fail the ones a previous process was running
+    db = SessionLocal()
+    try:
+        db.query(models.GenerationJob).filter(models.GenerationJob.status == models.JobStatus.running).update(
+            {"status": models.JobStatus.failed, "error": "Interrupted by server restart", "finished_at": datetime.utcnow()},
+            synchronize_session=False,
+        )
+        db.commit()
+        queued = db.query(models.GenerationJob.id).filter(models.GenerationJob.status == models.JobStatus.queued).all()
+    finally:
+        db.close()
+    for (job_id,) in queued:
+        submit_job(job_id)
+
+
+def _report_progress(job_id: int, placed: int, total: int, nodes: int, elapsed_ms: int) -> bool:
+    # own short-lived session so progress commits never touch the generation transaction
+    db = SessionLocal()
+    try:
+        job = db.get(models.GenerationJob, job_id)
+        if job is None:
+            return False
+        job.placed_sessions = placed
+        job.total_sessions = total
+        job.nodes = nodes
+        job.elapsed_ms = elapsed_ms
+        db.commit()
+        return not job.cancel_requested
+    finally:
+        db.close()
+
+
+def run_job(job_id: int):
+    # runs inside a worker process
+    db = SessionLocal()
+    try:
+        started = db.query(models.GenerationJob).filter(
+            models.GenerationJob.id == job_id, models.GenerationJob.status == models.JobStatus.queued
+        ).update({"status": models.JobStatus.running, "started_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        if not started:
+            return  # cancelled (or picked up) before it started
+        job = db.get(models.GenerationJob, job_id)
+        payload = schemas.TimetableIn.model_validate_json(job.payload)
+
+        def on_progress(placed, total, nodes, elapsed_ms):
+            return _report_progress(job_id, placed, total, nodes, elapsed_ms)
+
+        try:
+            result = generate_timetables(db, payload, on_progress)
+        except GenerationCancelled:
+            db.rollback()
+            status, result, error = models.JobStatus.cancelled, None, None
+        except InfeasibleInput as exc:
+            db.rollback()
+            status, result, error = models.JobStatus.failed, {"success": False, "issues": exc.issues}, str(exc)
+        except Exception as exc:
+            db.rollback()
+            status, result, error = models.JobStatus.failed, None, str(exc)
+        else:
+            status, error = models.JobStatus.done, None
+
+        job = db.get(models.GenerationJob, job_id)
+        job.status = status
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        if result is not None:
+            job.result = json.dumps(result)
+        if status == models.JobStatus.done:
+            job.total_sessions = result["sessions"]
+            job.placed_sessions = result["sessions"] - len(result["unplaced"])
+            job.nodes = result["nodes"]
+        if job.started_at:
+            job.elapsed_ms = int((job.finished_at - job.started_at).total_seconds() * 1000)
+        db.commit()
+    finally:
+        db.close()
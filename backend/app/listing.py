@@ -0,0 +1,114 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+from fastapi import HTTPException, Query
+from sqlalchemy import DateTime, and_, literal, or_, select
+from sqlalchemy.orm import Session
+from .render import JSONBytes, rows_response
+
+# rows a list endpoint returns at most per request, and by default
+LIST_MAX_LIMIT = int(os.getenv("LIST_MAX_LIMIT", "1000"))
+# response header carrying the cursor of the next page, absent on the last one
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageQuery:
+    """Query parameters shared by the list endpoints.
+
+    ``fields`` is a comma separated projection, ``sort`` a column name,
+    descending with a leading ``-``. Pages are keyset based: ``cursor`` is
+    the ``X-Next-Cursor`` header of the previous page and only valid with the
+    same sort. A page holds ``limit`` rows, ``LIST_MAX_LIMIT`` at most and by
+    default, so a longer list takes several requests.
+    """
+
+    def __init__(
+        self,
+        fields: Optional[str] = Query(None, description="comma separated columns to return, default all"),
+        sort: str = Query("id", description="column to order by, '-' prefix for descending"),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+        limit: Optional[int] = Query(None, ge=1, description=f"rows per page, at most {LIST_MAX_LIMIT}"),
+    ):
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        self.sort = sort
+        self.cursor = cursor
+        self.limit = min(limit or LIST_MAX_LIMIT, LIST_MAX_LIMIT)
+
+
+def schema_columns(model, schema) -> Dict[str, object]:
+    # the model columns behind every field of an output schema, in the schema's order
+    return {name: getattr(model, name) for name in schema.model_fields}
+
+
+def _encode_cursor(sort: str, value, key) -> str:
+    raw = json.dumps([sort, value.isoformat() if isinstance(value, datetime) else value, key])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str, column):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail="Cursor belongs to a different sort; start again without it")
+    if value is not None and isinstance(column.type, DateTime):
+        value = datetime.fromisoformat(value)
+    return value, key
+
+
+def _after(column, key_column, value, key, descending: bool):
+    # rows past (value, key) in the page order; NULL sorts first ascending and last descending,
+    # as SQLite and MySQL both order it. The value is bound with the column's type, so booleans
+    # and enums compare as stored
+    if value is not None:
+        value = literal(value, column.type)
+    if descending:
+        if value is None:
+            return and_(column.is_(None), key_column < key)
+        return or_(column < value, and_(column == value, key_column < key), column.is_(None))
+    if value is None:
+        return or_(and_(column.is_(None), key_column > key), column.is_not(None))
+    return or_(column > value, and_(column == value, key_column > key))
+
+
+def list_page(db: Session, page: PageQuery, columns: Dict[str, object],
+              where: Sequence = (), joins: Sequence = ()) -> JSONBytes:
+    """One page of a list endpoint, selecting only the columns asked for.
+
+    ``columns`` maps output names to column expressions and holds ``id``, the
+    tie breaker of every sort; ``joins`` are (target, onclause) outer joins
+    some columns need. Rows are rendered straight from the selected tuples:
+    the route's response model documents them but is not run.
+    """
+    fields = page.fields or list(columns)
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}, expected some of {list(columns)}")
+    descending = page.sort.startswith("-")
+    sort = page.sort.lstrip("-")
+    if sort not in columns:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{sort}', expected one of {list(columns)}")
+    column, key_column = columns[sort], columns["id"]
+
+    # the sort column and id are read even when not returned: the next cursor needs them. They
+    # come after the fields, which rows_response names and so keeps
+    names = list(dict.fromkeys([*fields, sort, "id"]))
+    stmt = select(*(columns[n].label(n) for n in names)).select_from(key_column.class_)
+    for target, onclause in joins:
+        stmt = stmt.outerjoin(target, onclause)
+    stmt = stmt.where(*where)
+    if page.cursor:
+        stmt = stmt.where(_after(column, key_column, *_decode_cursor(page.cursor, page.sort, column), descending))
+    order = (column.desc(), key_column.desc()) if descending else (column.asc(), key_column.asc())
+    rows = db.execute(stmt.order_by(*order).limit(page.limit + 1)).all()
+
+    headers = {}
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        headers[NEXT_CURSOR_HEADER] = _encode_cursor(page.sort, last[names.index(sort)], last[names.index("id")])
+    return rows_response(fields, rows, headers)
@@ -2,8 +2,10 @@ import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .database import init_db
+from .jobs import recover_jobs, shutdown_executor
 from .routes.crud import router as crud_router
 from .routes.timetable import router as timetable_router
+from .routes.jobs import router as jobs_router
 from .routes.dashboard import router as dashboard_router
 from .auth import router as auth_router
 
@@ -19,11 +21,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Routers
 app.include_router(auth_router, prefix=API_PREFIX)
 app.include_router(crud_router, prefix=API_PREFIX)
+# jobs before timetable so /timetable/jobs is not taken for /timetable/{tt_id}
+app.include_router(jobs_router, prefix=API_PREFIX)
 app.include_router(timetable_router, prefix=API_PREFIX)
 app.include_router(dashboard_router, prefix=API_PREFIX)
 
@@ -31,6 +36,12 @@ app.include_router(dashboard_router, prefix=API_PREFIX)
 @app.on_event("startup")
 def on_startup():
     init_db()
+    recover_jobs()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_executor()
 
 
 @app.get("/")
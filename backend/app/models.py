@@ -1,6 +1,6 @@
 from datetime import datetime
 from sqlalchemy import (
-    Boolean, Column, DateTime, Enum, ForeignKey, Integer, String, UniqueConstraint
+    Boolean, Column, DateTime, Enum, ForeignKey, Index, Integer, LargeBinary, String, Text, UniqueConstraint
 )
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -24,6 +24,14 @@ class ModeType(str, enum.Enum):
     college = "college"
 
 
+class JobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+    cancelled = "cancelled"
+
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -49,6 +57,7 @@ class Room(Base):
     floor = Column(String(10), nullable=True)  # e.g., D3, 2, etc.
     type = Column(Enum(RoomType), default=RoomType.classroom, nullable=False)
     capacity = Column(Integer, nullable=True)
+    preferred_for = Column(Enum(SubjectType), nullable=True)  # session kind offered this room first
     __table_args__ = (UniqueConstraint("department_id", "room_number", name="uq_room_per_dept"),)
 
 
@@ -61,6 +70,17 @@ class Teacher(Base):
     is_school = Column(Boolean, default=True)
 
 
+class TeacherAvailability(Base):
+    # one row per teacher and day; bit p of each mask is period p of that day
+    __tablename__ = "teacher_availability"
+    id = Column(Integer, primary_key=True)
+    teacher_id = Column(Integer, ForeignKey("teachers.id"), nullable=False)
+    day_index = Column(Integer, nullable=False)  # 0=Mon ... 5=Sat
+    unavailable = Column(Integer, default=0, nullable=False)  # hard: never scheduled
+    disliked = Column(Integer, default=0, nullable=False)  # soft: avoided by the optimizer
+    __table_args__ = (UniqueConstraint("teacher_id", "day_index", name="uq_availability_per_day"),)
+
+
 class ClassGroup(Base):
     __tablename__ = "classes"
     id = Column(Integer, primary_key=True)
@@ -78,6 +98,7 @@ class Division(Base):
     class_id = Column(Integer, ForeignKey("classes.id"), nullable=False)
     index = Column(Integer, default=0)  # 0-based index A=0, B=1
     batch_count = Column(Integer, default=0)  # 0 for school, up to 3 for college
+    strength = Column(Integer, nullable=True)  # students; rooms with a smaller capacity are skipped
     __table_args__ = (UniqueConstraint("class_id", "index", name="uq_division_per_class_index"),)
 
 
@@ -86,7 +107,7 @@ class Subject(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(255), nullable=False)
     type = Column(Enum(SubjectType), default=SubjectType.lecture, nullable=False)
-    class_id = Column(Integer, ForeignKey("classes.id"), nullable=False)
+    class_id = Column(Integer, ForeignKey("classes.id"), nullable=False, index=True)
     hours_per_week = Column(Integer, default=0)
     can_be_twice_in_day = Column(Boolean, default=False)
 
@@ -97,7 +118,12 @@ class SubjectTeacher(Base):
     subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False)
     teacher_id = Column(Integer, ForeignKey("teachers.id"), nullable=False)
     division_id = Column(Integer, ForeignKey("divisions.id"), nullable=True)  # per-division assignment
-    __table_args__ = (UniqueConstraint("subject_id", "teacher_id", "division_id", name="uq_subject_teacher_div"),)
+    __table_args__ = (
+        UniqueConstraint("subject_id", "teacher_id", "division_id", name="uq_subject_teacher_div"),
+        # a teacher's subjects, and a division's assignments when generating
+        Index("ix_subject_teachers_teacher", "teacher_id"),
+        Index("ix_subject_teachers_division", "division_id", "subject_id"),
+    )
 
 
 class Timetable(Base):
@@ -109,6 +135,12 @@ class Timetable(Base):
     mode = Column(Enum(ModeType), nullable=False)
     published = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    grid_version = Column(Integer, default=0)  # bumped by every write the rendered grid must reflect
+    __table_args__ = (
+        # occupancy is read per department, repair's sibling timetables per class
+        Index("ix_timetables_department", "department_id", "published"),
+        Index("ix_timetables_class", "class_id", "published"),
+    )
 
 
 class Batch(Base):
@@ -130,7 +162,13 @@ class TimetableEntry(Base):
     subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False)
     teacher_id = Column(Integer, ForeignKey("teachers.id"), nullable=False)
     room_id = Column(Integer, ForeignKey("rooms.id"), nullable=True)
-    __table_args__ = (UniqueConstraint("timetable_id", "day_index", "period_index", "division_id", "batch_number", name="uq_slot_unique"),)
+    __table_args__ = (
+        UniqueConstraint("timetable_id", "day_index", "period_index", "division_id", "batch_number", name="uq_slot_unique"),
+        # division, teacher and room views, one range scan each (the unique constraint serves timetable_id)
+        Index("ix_entries_division_slot", "division_id", "day_index", "period_index"),
+        Index("ix_entries_teacher_slot", "teacher_id", "day_index", "period_index"),
+        Index("ix_entries_room_slot", "room_id", "day_index", "period_index"),
+    )
 
 
 class TimeConfig(Base):
@@ -148,4 +186,41 @@ class TimeConfig(Base):
     allow_subject_twice_in_day = Column(Boolean, default=False)
     __table_args__ = (
         UniqueConstraint("department_id", "class_id", name="uq_timeconf_scope"),
-    )
\ No newline at end of file
+    )
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+    id = Column(Integer, primary_key=True)
+    status = Column(Enum(JobStatus), default=JobStatus.queued, nullable=False)
+    payload = Column(Text, nullable=False)  # TimetableIn as JSON
+    class_id = Column(Integer, ForeignKey("classes.id"), nullable=True)
+    total_sessions = Column(Integer, default=0)
+    placed_sessions = Column(Integer, default=0)
+    nodes = Column(Integer, default=0)
+    elapsed_ms = Column(Integer, default=0)
+    cancel_requested = Column(Boolean, default=False)
+    result = Column(Text, nullable=True)  # generate response as JSON once done
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class SolutionCache(Base):
+    # solved assignments keyed by a hash of the problem and solver settings (see solver/cache.py)
+    __tablename__ = "solution_cache"
+    key = Column(String(64), primary_key=True)
+    payload = Column(Text, nullable=False)  # placements and stats as JSON
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    used_at = Column(DateTime, default=datetime.utcnow, index=True)  # LRU order
+
+
+class TimetableGrid(Base):
+    # rendered grid JSON of a timetable, shared between server processes (see grid.py)
+    __tablename__ = "timetable_grids"
+    timetable_id = Column(Integer, ForeignKey("timetables.id"), primary_key=True)
+    tag = Column(String(64), nullable=False)  # grid_tag of the timetable it was rendered from
+    body = Column(LargeBinary, nullable=False)
+    rendered_at = Column(DateTime, default=datetime.utcnow)
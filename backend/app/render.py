@@ -0,0 +1,40 @@
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Dict, Optional, Sequence
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode(data) -> bytes:
+    # compact JSON; datetimes as ISO 8601 and enums as their values, as FastAPI renders them
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), default=_default).encode()
+
+
+class JSONBytes(Response):
+    """A JSON body that is already rendered, returned as it is.
+
+    Routes returning one keep their ``response_model`` as the documented
+    contract, but FastAPI neither validates nor re-encodes the content.
+    """
+
+    media_type = "application/json"
+
+
+def rows_response(names: Sequence[str], rows, headers: Optional[Dict[str, str]] = None) -> JSONBytes:
+    # Core row tuples as a JSON list of objects; each row's leading values are named by `names`
+    return JSONBytes(encode([dict(zip(names, row)) for row in rows]), headers=headers)
@@ -1,15 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from ..database import get_db
 from .. import models, schemas
+from ..grid import touch_grids
+from ..listing import PageQuery, list_page, schema_columns
+from ..render import JSONBytes, encode, rows_response
+from ..schedule import free_rooms, room_schedule, teacher_schedule
 
 router = APIRouter(tags=["crud"])
 
 # Departments
 @router.get("/departments", response_model=List[schemas.DepartmentOut])
 def list_departments(db: Session = Depends(get_db)):
-    return db.query(models.Department).all()
+    D = models.Department
+    return rows_response(["id", "name"], db.execute(select(D.id, D.name).order_by(D.id)))
 
 
 @router.post("/departments", response_model=schemas.DepartmentOut)
@@ -64,11 +70,54 @@ def upsert_time_config(payload: schemas.TimeConfigIn, db: Session = Depends(get_
 
 # Rooms
 @router.get("/rooms", response_model=List[schemas.RoomOut])
-def list_rooms(db: Session = Depends(get_db), department_id: Optional[int] = None):
-    q = db.query(models.Room)
+def list_rooms(
+    page: PageQuery = Depends(),
+    db: Session = Depends(get_db),
+    department_id: Optional[int] = None,
+    type: Optional[schemas.RoomType] = None,
+    min_capacity: Optional[int] = None,
+    q: Optional[str] = None,
+):
+    R = models.Room
+    where = []
     if department_id:
-        q = q.filter(models.Room.department_id == department_id)
-    return q.all()
+        where.append(R.department_id == department_id)
+    if type:
+        where.append(R.type == type.value)
+    if min_capacity:
+        where.append(R.capacity >= min_capacity)
+    if q:
+        where.append(R.room_number.contains(q, autoescape=True))
+    return list_page(db, page, schema_columns(R, schemas.RoomOut), where)
+
+
+@router.get("/rooms/free", response_model=List[schemas.RoomOut])
+def search_free_rooms(
+    day_index: int,
+    period_index: int,
+    periods: int = 1,
+    department_id: Optional[int] = None,
+    type: Optional[schemas.RoomType] = None,
+    min_capacity: Optional[int] = None,
+    scope: str = "published",
+    db: Session = Depends(get_db),
+):
+    # rooms with no stored entry over `periods` periods from (day_index, period_index)
+    try:
+        return free_rooms(db, day_index, period_index, periods, department_id, type.value if type else None,
+                          min_capacity, scope)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.get("/rooms/{room_id}/timetable")
+def room_timetable(room_id: int, scope: str = "published", db: Session = Depends(get_db)):
+    if not db.query(models.Room).get(room_id):
+        raise HTTPException(status_code=404, detail="Not found")
+    try:
+        return JSONBytes(encode({"room_id": room_id, "scope": scope, "entries": room_schedule(db, room_id, scope)}))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 @router.post("/rooms", response_model=schemas.RoomOut)
@@ -87,6 +136,7 @@ def update_room(room_id: int, payload: schemas.RoomIn, db: Session = Depends(get
         raise HTTPException(status_code=404, detail="Not found")
     for k, v in payload.dict().items():
         setattr(room, k, v)
+    touch_grids(db, room_id=room_id)
     db.commit()
     db.refresh(room)
     return room
@@ -98,14 +148,29 @@ def delete_room(room_id: int, db: Session = Depends(get_db)):
     if not room:
         raise HTTPException(status_code=404, detail="Not found")
     db.delete(room)
+    touch_grids(db, room_id=room_id)
     db.commit()
     return {"deleted": True}
 
 
 # Teachers
 @router.get("/teachers", response_model=List[schemas.TeacherOut])
-def list_teachers(db: Session = Depends(get_db)):
-    return db.query(models.Teacher).all()
+def list_teachers(
+    page: PageQuery = Depends(),
+    db: Session = Depends(get_db),
+    department_id: Optional[int] = None,
+    is_school: Optional[bool] = None,
+    q: Optional[str] = None,
+):
+    T = models.Teacher
+    where = []
+    if department_id:
+        where.append(T.department_id == department_id)
+    if is_school is not None:
+        where.append(T.is_school.is_(is_school))
+    if q:
+        where.append(T.name.contains(q, autoescape=True))
+    return list_page(db, page, schema_columns(T, schemas.TeacherOut), where)
 
 
 @router.post("/teachers", response_model=schemas.TeacherOut)
@@ -117,26 +182,100 @@ def create_teacher(payload: schemas.TeacherIn, db: Session = Depends(get_db)):
     return teacher
 
 
-@router.get("/teachers/{teacher_id}/availability")
-def get_teacher_availability(teacher_id: int):
-    return {"teacher_id": teacher_id, "availability": "full"}
+def _availability_out(teacher_id: int, rows) -> dict:
+    out = {"teacher_id": teacher_id, "unavailable": [], "disliked": []}
+    for row in sorted(rows, key=lambda r: r.day_index):
+        for key in ("unavailable", "disliked"):
+            mask = getattr(row, key) or 0
+            out[key] += [[row.day_index, p] for p in range(schemas.AVAILABILITY_PERIODS) if mask >> p & 1]
+    return out
+
+
+def _save_availability(db: Session, teacher_id: int, payload: schemas.AvailabilityIn):
+    # replaces the teacher's matrix: one row per day that has any marked period
+    masks = {}
+    for key in ("unavailable", "disliked"):
+        for day, period in getattr(payload, key):
+            masks.setdefault(day, {"unavailable": 0, "disliked": 0})[key] |= 1 << period
+    db.query(models.TeacherAvailability).filter(models.TeacherAvailability.teacher_id == teacher_id).delete()
+    db.add_all(models.TeacherAvailability(teacher_id=teacher_id, day_index=day, **m) for day, m in masks.items())
+
+
+@router.get("/teachers/availability", response_model=List[schemas.AvailabilityOut])
+def list_teacher_availability(db: Session = Depends(get_db), teacher_ids: Optional[List[int]] = Query(None)):
+    q = db.query(models.TeacherAvailability)
+    if teacher_ids:
+        q = q.filter(models.TeacherAvailability.teacher_id.in_(teacher_ids))
+    by_teacher = {t: [] for t in teacher_ids or []}
+    for row in q.all():
+        by_teacher.setdefault(row.teacher_id, []).append(row)
+    return [_availability_out(t, rows) for t, rows in sorted(by_teacher.items())]
+
+
+@router.put("/teachers/availability", response_model=List[schemas.AvailabilityOut])
+def update_teacher_availability_bulk(payload: List[schemas.TeacherAvailabilityIn], db: Session = Depends(get_db)):
+    ids = {item.teacher_id for item in payload}
+    found = {t for (t,) in db.query(models.Teacher.id).filter(models.Teacher.id.in_(ids))}
+    if ids - found:
+        raise HTTPException(status_code=404, detail=f"Teachers not found: {sorted(ids - found)}")
+    for item in payload:
+        _save_availability(db, item.teacher_id, item)
+    db.commit()
+    return list_teacher_availability(db, sorted(ids))
+
+
+@router.get("/teachers/{teacher_id}/availability", response_model=schemas.AvailabilityOut)
+def get_teacher_availability(teacher_id: int, db: Session = Depends(get_db)):
+    if not db.query(models.Teacher).get(teacher_id):
+        raise HTTPException(status_code=404, detail="Not found")
+    rows = db.query(models.TeacherAvailability).filter(models.TeacherAvailability.teacher_id == teacher_id).all()
+    return _availability_out(teacher_id, rows)
+
 
+@router.put("/teachers/{teacher_id}/availability", response_model=schemas.AvailabilityOut)
+def update_teacher_availability(teacher_id: int, payload: schemas.AvailabilityIn, db: Session = Depends(get_db)):
+    if not db.query(models.Teacher).get(teacher_id):
+        raise HTTPException(status_code=404, detail="Not found")
+    _save_availability(db, teacher_id, payload)
+    db.commit()
+    return get_teacher_availability(teacher_id, db)
 
-@router.put("/teachers/{teacher_id}/availability")
-def update_teacher_availability(teacher_id: int, availability: dict):
-    return {"teacher_id": teacher_id, "availability": availability}
+
+@router.get("/teachers/{teacher_id}/timetable")
+def teacher_timetable(teacher_id: int, scope: str = "published", db: Session = Depends(get_db)):
+    if not db.query(models.Teacher).get(teacher_id):
+        raise HTTPException(status_code=404, detail="Not found")
+    try:
+        return JSONBytes(encode({"teacher_id": teacher_id, "scope": scope,
+                                 "entries": teacher_schedule(db, teacher_id, scope)}))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 @router.get("/teachers/{teacher_id}/subjects")
 def teacher_subjects(teacher_id: int, db: Session = Depends(get_db)):
-    joins = db.query(models.SubjectTeacher).filter(models.SubjectTeacher.teacher_id == teacher_id).all()
-    return [j.subject_id for j in joins]
+    ST = models.SubjectTeacher
+    return db.execute(select(ST.subject_id).where(ST.teacher_id == teacher_id).order_by(ST.id)).scalars().all()
 
 
 # Classes
 @router.get("/classes", response_model=List[schemas.ClassOut])
-def list_classes(db: Session = Depends(get_db)):
-    return db.query(models.ClassGroup).all()
+def list_classes(
+    page: PageQuery = Depends(),
+    db: Session = Depends(get_db),
+    department_id: Optional[int] = None,
+    mode: Optional[schemas.ModeType] = None,
+    q: Optional[str] = None,
+):
+    C = models.ClassGroup
+    where = []
+    if department_id:
+        where.append(C.department_id == department_id)
+    if mode:
+        where.append(C.mode == mode.value)
+    if q:
+        where.append(C.name.contains(q, autoescape=True))
+    return list_page(db, page, schema_columns(C, schemas.ClassOut), where)
 
 
 @router.post("/classes", response_model=schemas.ClassOut)
@@ -180,11 +319,14 @@ def delete_class(class_id: int, db: Session = Depends(get_db)):
 
 # Divisions
 @router.get("/divisions", response_model=List[schemas.DivisionOut])
-def list_divisions(class_id: Optional[int] = None, db: Session = Depends(get_db)):
-    q = db.query(models.Division)
-    if class_id:
-        q = q.filter(models.Division.class_id == class_id)
-    return q.all()
+def list_divisions(
+    class_id: Optional[int] = None,
+    page: PageQuery = Depends(),
+    db: Session = Depends(get_db),
+):
+    D = models.Division
+    where = [D.class_id == class_id] if class_id else []
+    return list_page(db, page, schema_columns(D, schemas.DivisionOut), where)
 
 
 @router.post("/divisions", response_model=schemas.DivisionOut)
@@ -194,7 +336,7 @@ def create_division(payload: schemas.DivisionIn, db: Session = Depends(get_db)):
     if payload.index is None:
         max_idx = db.query(models.Division).filter(models.Division.class_id == payload.class_id).order_by(models.Division.index.desc()).first()
         idx = (max_idx.index + 1) if max_idx else 0
-    d = models.Division(name=payload.name, class_id=payload.class_id, index=idx, batch_count=payload.batch_count)
+    d = models.Division(name=payload.name, class_id=payload.class_id, index=idx, batch_count=payload.batch_count, strength=payload.strength)
     db.add(d)
     db.commit()
     db.refresh(d)
@@ -208,6 +350,7 @@ def update_division(division_id: int, payload: schemas.DivisionIn, db: Session =
         raise HTTPException(status_code=404, detail="Not found")
     for k, v in payload.dict().items():
         setattr(d, k, v)
+    touch_grids(db, division_id=division_id)
     db.commit()
     db.refresh(d)
     return d
@@ -219,14 +362,16 @@ def delete_division(division_id: int, db: Session = Depends(get_db)):
     if not d:
         raise HTTPException(status_code=404, detail="Not found")
     db.delete(d)
+    touch_grids(db, division_id=division_id)
     db.commit()
     return {"deleted": True}
 
 
 @router.get("/divisions/{division_id}/timetable")
 def division_timetable(division_id: int, db: Session = Depends(get_db)):
-    entries = db.query(models.TimetableEntry).filter(models.TimetableEntry.division_id == division_id).all()
-    return {"division_id": division_id, "entries": len(entries)}
+    E = models.TimetableEntry
+    count = db.execute(select(func.count(E.id)).where(E.division_id == division_id)).scalar()
+    return {"division_id": division_id, "entries": count}
 
 
 @router.get("/divisions/{division_id}/students-count")
@@ -236,11 +381,22 @@ def division_students_count(division_id: int):
 
 # Subjects
 @router.get("/subjects", response_model=List[schemas.SubjectOut])
-def list_subjects(db: Session = Depends(get_db), class_id: Optional[int] = None):
-    q = db.query(models.Subject)
+def list_subjects(
+    page: PageQuery = Depends(),
+    db: Session = Depends(get_db),
+    class_id: Optional[int] = None,
+    type: Optional[schemas.SubjectType] = None,
+    q: Optional[str] = None,
+):
+    S = models.Subject
+    where = []
     if class_id:
-        q = q.filter(models.Subject.class_id == class_id)
-    return q.all()
+        where.append(S.class_id == class_id)
+    if type:
+        where.append(S.type == type.value)
+    if q:
+        where.append(S.name.contains(q, autoescape=True))
+    return list_page(db, page, schema_columns(S, schemas.SubjectOut), where)
 
 
 @router.post("/subjects", response_model=schemas.SubjectOut)
@@ -259,6 +415,7 @@ def update_subject(subject_id: int, payload: schemas.SubjectIn, db: Session = De
         raise HTTPException(status_code=404, detail="Not found")
     for k, v in payload.dict().items():
         setattr(s, k, v)
+    touch_grids(db, subject_id=subject_id)
     db.commit()
     db.refresh(s)
     return s
@@ -270,17 +427,21 @@ def delete_subject(subject_id: int, db: Session = Depends(get_db)):
     if not s:
         raise HTTPException(status_code=404, detail="Not found")
     db.delete(s)
+    touch_grids(db, subject_id=subject_id)
     db.commit()
     return {"deleted": True}
 
 
 # Batches
 @router.get("/batches", response_model=List[schemas.BatchOut])
-def list_batches(db: Session = Depends(get_db), division_id: Optional[int] = None):
-    q = db.query(models.Batch)
-    if division_id:
-        q = q.filter(models.Batch.division_id == division_id)
-    return q.all()
+def list_batches(
+    page: PageQuery = Depends(),
+    db: Session = Depends(get_db),
+    division_id: Optional[int] = None,
+):
+    B = models.Batch
+    where = [B.division_id == division_id] if division_id else []
+    return list_page(db, page, schema_columns(B, schemas.BatchOut), where)
 
 
 @router.post("/batches", response_model=schemas.BatchOut)
@@ -325,14 +486,21 @@ def delete_batch(batch_id: int, db: Session = Depends(get_db)):
 # Subject-Teacher assignments
 @router.get("/subject-teachers", response_model=List[schemas.SubjectTeacherOut])
 def list_subject_teachers(
-    db: Session = Depends(get_db), subject_id: Optional[int] = None, division_id: Optional[int] = None
+    page: PageQuery = Depends(),
+    db: Session = Depends(get_db),
+    subject_id: Optional[int] = None,
+    teacher_id: Optional[int] = None,
+    division_id: Optional[int] = None,
 ):
-    q = db.query(models.SubjectTeacher)
+    ST = models.SubjectTeacher
+    where = []
     if subject_id:
-        q = q.filter(models.SubjectTeacher.subject_id == subject_id)
+        where.append(ST.subject_id == subject_id)
+    if teacher_id:
+        where.append(ST.teacher_id == teacher_id)
     if division_id:
-        q = q.filter(models.SubjectTeacher.division_id == division_id)
-    return q.all()
+        where.append(ST.division_id == division_id)
+    return list_page(db, page, schema_columns(ST, schemas.SubjectTeacherOut), where)
 
 
 @router.post("/subject-teachers", response_model=schemas.SubjectTeacherOut)
@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from ..database import get_db
+from .. import models, schemas
+from ..jobs import submit_job
+from ..solver import parse_options
+
+router = APIRouter(prefix="/timetable/jobs", tags=["timetable"])
+
+
+def _job_out(job: models.GenerationJob) -> schemas.JobOut:
+    out = schemas.JobOut.model_validate(job)
+    if out.result:
+        out.ids = out.result.get("ids", [])
+    return out
+
+
+@router.post("", response_model=schemas.JobOut, status_code=202)
+def submit_generation(payload: schemas.TimetableIn, db: Session = Depends(get_db)):
+    try:
+        parse_options(payload.options)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    job = models.GenerationJob(payload=payload.model_dump_json(), class_id=payload.class_id)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    submit_job(job.id)
+    return _job_out(job)
+
+
+@router.get("", response_model=List[schemas.JobOut])
+def list_jobs(db: Session = Depends(get_db), status: Optional[models.JobStatus] = None, limit: int = 50):
+    q = db.query(models.GenerationJob)
+    if status:
+        q = q.filter(models.GenerationJob.status == status)
+    return [_job_out(j) for j in q.order_by(models.GenerationJob.id.desc()).limit(min(max(limit, 1), 200)).all()]
+
+
+@router.get("/{job_id}", response_model=schemas.JobOut)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(models.GenerationJob).get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Not found")
+    return _job_out(job)
+
+
+@router.post("/{job_id}/cancel", response_model=schemas.JobOut)
+def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(models.GenerationJob).get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Not found")
+    if job.status in (models.JobStatus.queued, models.JobStatus.running):
+        job.cancel_requested = True
+        # a queued job is cancelled right away; a running one stops at its next progress check
+        db.query(models.GenerationJob).filter(
+            models.GenerationJob.id == job_id, models.GenerationJob.status == models.JobStatus.queued
+        ).update({"status": models.JobStatus.cancelled, "finished_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        db.refresh(job)
+    return _job_out(job)
@@ -0,0 +1,136 @@
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased
+from . import models
+from .grid import DAYS
+from .solver.occupancy import STRIDE
+
+# which stored timetables a teacher / room view or a free-room search looks at
+VIEW_SCOPES = ("published", "all")
+
+
+def _check_scope(scope: str):
+    if scope not in VIEW_SCOPES:
+        raise ValueError(f"Unknown scope '{scope}', expected one of {list(VIEW_SCOPES)}")
+
+
+def view_statement(column, key: int, scope: str):
+    # every entry of `key` in one query, names joined in, ordered by slot; served by the
+    # (teacher_id | room_id, day_index, period_index) indexes on timetable_entries
+    _check_scope(scope)
+    E, T = models.TimetableEntry, models.Timetable
+    S, D, R, P = models.Subject, models.Division, models.Room, aliased(models.Teacher)
+    stmt = (
+        select(E.day_index, E.period_index, E.timetable_id, T.name, E.division_id, D.name, E.batch_number,
+               E.subject_id, S.name, E.teacher_id, P.name, E.room_id, R.room_number)
+        .join(T, T.id == E.timetable_id)
+        .outerjoin(D, D.id == E.division_id)
+        .outerjoin(S, S.id == E.subject_id)
+        .outerjoin(P, P.id == E.teacher_id)
+        .outerjoin(R, R.id == E.room_id)
+        .where(column == key)
+        .order_by(E.day_index, E.period_index, E.timetable_id, E.batch_number)
+    )
+    if scope == "published":
+        stmt = stmt.where(T.published.is_(True))
+    return stmt
+
+
+def _view(db: Session, column, key: int, scope: str) -> List[dict]:
+    out = []
+    for (day, period, tt_id, tt_name, division_id, division_name, batch, subject_id, subject_name,
+         teacher_id, teacher_name, room_id, room_number) in db.execute(view_statement(column, key, scope)):
+        out.append({
+            "day_index": day,
+            "day": DAYS[day] if day < len(DAYS) else None,
+            "period_index": period,
+            "timetable": {"id": tt_id, "name": tt_name},
+            "division": {"id": division_id, "name": division_name},
+            "batch_number": batch,
+            "subject": {"id": subject_id, "name": subject_name},
+            "teacher": {"id": teacher_id, "name": teacher_name},
+            "room": {"id": room_id, "room_number": room_number},
+        })
+    return out
+
+
+def teacher_schedule(db: Session, teacher_id: int, scope: str = "published") -> List[dict]:
+    return _view(db, models.TimetableEntry.teacher_id, teacher_id, scope)
+
+
+def room_schedule(db: Session, room_id: int, scope: str = "published") -> List[dict]:
+    return _view(db, models.TimetableEntry.room_id, room_id, scope)
+
+
+class RoomBusy:
+    """Taken slots of every room over all stored timetables of a scope, one int bitmask per room.
+
+    Bit ``day * STRIDE + period`` is set when the room holds an entry there, as
+    in the solver's occupancy index, so a span is free when its mask does not
+    intersect the room's.
+    """
+
+    def __init__(self):
+        self.room: Dict[int, int] = defaultdict(int)
+
+    def add(self, room_id: int, day: int, period: int):
+        if period < STRIDE:
+            self.room[room_id] |= 1 << (day * STRIDE + period)
+
+    def free(self, room_ids, day: int, period: int, periods: int = 1) -> List[int]:
+        mask = ((1 << periods) - 1) << (day * STRIDE + period)
+        return [r for r in room_ids if not self.room.get(r, 0) & mask]
+
+
+_busy: Dict[str, Tuple[tuple, RoomBusy]] = {}
+_lock = threading.Lock()
+
+
+def load_room_busy(db: Session, scope: str = "published") -> RoomBusy:
+    # cached per scope. Every write to a timetable's entries creates or deletes a timetable or
+    # bumps its grid_version, so an aggregate over the (small) timetables table tells whether
+    # the index is stale without counting entries, whichever process made the change. The
+    # latest creation time catches a new timetable reusing a deleted one's id (as in grid_tag)
+    _check_scope(scope)
+    T, E = models.Timetable, models.TimetableEntry
+    stamp = select(func.count(T.id), func.max(T.id), func.sum(func.coalesce(T.grid_version, 0)),
+                   func.max(T.created_at))
+    if scope == "published":
+        stamp = stamp.where(T.published.is_(True))
+    fingerprint = tuple(db.execute(stamp).one())
+    with _lock:
+        cached = _busy.get(scope)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+    index = RoomBusy()
+    stmt = select(E.room_id, E.day_index, E.period_index).join(T, T.id == E.timetable_id).where(E.room_id.is_not(None))
+    if scope == "published":
+        stmt = stmt.where(T.published.is_(True))
+    for room_id, day, period in db.execute(stmt):
+        index.add(room_id, day, period)
+    with _lock:
+        _busy[scope] = (fingerprint, index)
+    return index
+
+
+def free_rooms(db: Session, day: int, period: int, periods: int = 1, department_id: Optional[int] = None,
+               room_type: Optional[str] = None, min_capacity: Optional[int] = None,
+               scope: str = "published") -> List[models.Room]:
+    # rooms with no entry over `periods` periods from (day, period); a department sees its own
+    # rooms and shared ones, as generation does
+    if day < 0 or period < 0 or periods < 1 or period + periods > STRIDE:
+        raise ValueError("day, period and periods must describe a span inside one day")
+    busy = load_room_busy(db, scope)
+    q = db.query(models.Room)
+    if department_id is not None:
+        q = q.filter((models.Room.department_id == department_id) | models.Room.department_id.is_(None))
+    if room_type:
+        q = q.filter(models.Room.type == room_type)
+    if min_capacity:
+        # like generation, a room without a capacity fits anyone
+        q = q.filter((models.Room.capacity >= min_capacity) | models.Room.capacity.is_(None))
+    rooms = q.order_by(models.Room.id).all()
+    free = set(busy.free([r.id for r in rooms], day, period, periods))
+    return [r for r in rooms if r.id in free]
@@ -1,7 +1,10 @@
+import json
+from datetime import datetime
 from typing import Optional, List, Any
 from pydantic import BaseModel, EmailStr
 from pydantic import ConfigDict, field_validator
 from enum import Enum
+from .models import JobStatus
 
 
 class RoomType(str, Enum):
@@ -66,6 +69,7 @@ class RoomIn(BaseModel):
     floor: Optional[str] = None
     type: RoomType = RoomType.classroom
     capacity: Optional[int] = None
+    preferred_for: Optional[SubjectType] = None
 
     @field_validator('department_id', mode='before')
     @classmethod
@@ -94,6 +98,11 @@ class RoomIn(BaseModel):
             return None
         return str(v)
 
+    @field_validator('preferred_for', mode='before')
+    @classmethod
+    def _preferred_cast(cls, v):
+        return None if v == "" else v
+
 
 class RoomOut(RoomIn):
     model_config = ConfigDict(from_attributes=True)
@@ -112,6 +121,32 @@ class TeacherOut(TeacherIn):
     id: int
 
 
+# periods per day an availability mask can hold (bits of a signed 32-bit column)
+AVAILABILITY_PERIODS = 31
+
+
+class AvailabilityIn(BaseModel):
+    # [day_index, period_index] cells; unavailable is hard, disliked only a preference
+    unavailable: List[List[int]] = []
+    disliked: List[List[int]] = []
+
+    @field_validator('unavailable', 'disliked')
+    @classmethod
+    def _cells(cls, v):
+        for cell in v:
+            if len(cell) != 2 or not 0 <= cell[0] < 7 or not 0 <= cell[1] < AVAILABILITY_PERIODS:
+                raise ValueError(f"cells are [day 0-6, period 0-{AVAILABILITY_PERIODS - 1}], got {cell}")
+        return v
+
+
+class AvailabilityOut(AvailabilityIn):
+    teacher_id: int
+
+
+class TeacherAvailabilityIn(AvailabilityIn):
+    teacher_id: int
+
+
 class ClassIn(BaseModel):
     name: str
     mode: ModeType = ModeType.school
@@ -130,6 +165,7 @@ class DivisionIn(BaseModel):
     class_id: int
     index: int = 0
     batch_count: int = 0
+    strength: Optional[int] = None
 
     @field_validator('class_id', 'index', 'batch_count', mode='before')
     @classmethod
@@ -141,6 +177,16 @@ class DivisionIn(BaseModel):
         except Exception:
             return v
 
+    @field_validator('strength', mode='before')
+    @classmethod
+    def _strength_cast(cls, v):
+        if v in ("", None):
+            return None
+        try:
+            return int(v)
+        except Exception:
+            return v
+
 
 class DivisionOut(DivisionIn):
     model_config = ConfigDict(from_attributes=True)
@@ -191,6 +237,24 @@ class TimetableIn(BaseModel):
     options: dict = {}
 
 
+class ValidateIn(BaseModel):
+    class_id: int
+    department_id: Optional[int] = None
+    mode: Optional[ModeType] = None  # defaults to the class's mode
+    options: dict = {}  # only `occupancy` matters here
+
+
+class RepairIn(BaseModel):
+    options: dict = {}  # same solver options as TimetableIn
+
+
+class DepartmentGenerateIn(BaseModel):
+    name: str
+    department_id: int
+    class_ids: List[int] = []  # empty = every class of the department
+    options: dict = {}
+
+
 class TimetableOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: int
@@ -201,6 +265,32 @@ class TimetableOut(BaseModel):
     published: bool
 
 
+class JobOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    status: JobStatus
+    class_id: Optional[int] = None
+    total_sessions: int = 0
+    placed_sessions: int = 0
+    nodes: int = 0
+    elapsed_ms: int = 0
+    cancel_requested: bool = False
+    ids: List[int] = []
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @field_validator('result', mode='before')
+    @classmethod
+    def _result_json(cls, v):
+        # stored as a JSON text column
+        if isinstance(v, str):
+            return json.loads(v)
+        return v
+
+
 class GridOut(BaseModel):
     days: List[str]
     grid: dict
@@ -0,0 +1,7 @@
+from .problem import Problem, Session, Solution
+from .state import SlotState
+from .base import Solver
+from .engine import SOLVERS, STRATEGIES, solve
+from .loader import build_problem, load_time_config
+from .options import parse_options
+from .occupancy import OccupancyIndex, invalidate_occupancy, load_occupancy
@@ -0,0 +1,20 @@
+from typing import Optional, Protocol
+from .problem import Problem, Solution
+
+
+class Solver(Protocol):
+    """A solving engine: takes a pure-data Problem, returns an assignment.
+
+    Engines honour the same budget arguments; ``on_progress`` is polled while
+    they run and returning False from it cancels the solve. ``seed`` fixes
+    whatever randomness an engine has; deterministic engines ignore it.
+    """
+
+    name: str
+
+    def available(self) -> bool:
+        ...
+
+    def solve(self, problem: Problem, symmetry: bool = True, time_limit_ms: Optional[int] = None,
+              max_nodes: Optional[int] = None, on_progress=None, seed: Optional[int] = None) -> Solution:
+        ...
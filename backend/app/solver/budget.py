@@ -0,0 +1,59 @@
+from collections import Counter
+from time import perf_counter
+from typing import Callable, Optional
+
+
+class Budget:
+    """Node and wall-clock allowance shared by one solve; searches call ``spend`` per node.
+
+    ``on_progress`` is called with the budget about every ``progress_interval``
+    seconds while the search runs; returning False cancels the solve.
+    """
+
+    def __init__(self, time_limit_ms: Optional[int] = None, max_nodes: Optional[int] = None,
+                 on_progress: Optional[Callable[["Budget"], bool]] = None, progress_interval: float = 0.5):
+        self.started = perf_counter()
+        self.deadline = self.started + time_limit_ms / 1000.0 if time_limit_ms else None
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.placed = 0  # sessions placed at the current search depth
+        self.stopped: Optional[str] = None  # "time_limit" / "node_limit" / "cancelled" once exhausted
+        self.counters: Counter = Counter()  # engine-specific tallies, reported as Solution.stats
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self._next_report = self.started + progress_interval
+
+    @property
+    def elapsed_ms(self) -> int:
+        return int((perf_counter() - self.started) * 1000)
+
+    def remaining_ms(self) -> Optional[int]:
+        # wall-clock time left, None without a time limit
+        if self.deadline is None:
+            return None
+        return max(0, int((self.deadline - perf_counter()) * 1000))
+
+    def expired(self) -> bool:
+        # wall clock or cancellation; the node limit only stops the search itself
+        if self.stopped in ("time_limit", "cancelled"):
+            return True
+        now = perf_counter()
+        if self.deadline is not None and now > self.deadline:
+            self.stopped = "time_limit"
+        elif self.on_progress is not None and now >= self._next_report:
+            self._next_report = now + self.progress_interval
+            if self.on_progress(self) is False:
+                self.stopped = "cancelled"
+        return self.stopped in ("time_limit", "cancelled")
+
+    def spend(self, placed: int = 0) -> bool:
+        # count one node; False once the budget is exhausted
+        self.nodes += 1
+        self.placed = placed
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            self.stopped = "node_limit"
+            return False
+        # the clock is only read every 64 nodes to keep the hot loop cheap
+        if not self.nodes & 63:
+            return not self.expired()
+        return True
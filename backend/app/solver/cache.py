@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as DbSession
+from .. import models
+from .problem import Problem, Solution
+
+# most entries kept; the least recently used go first
+CACHE_SIZE = int(os.getenv("SOLUTION_CACHE_SIZE", "256"))
+# bump when the solver or optimizer would answer the same problem differently
+CACHE_VERSION = 1
+
+
+def cache_key(problem: Problem, **settings) -> str:
+    """Content address of a solve: the problem plus every setting that changes its answer.
+
+    The problem already holds what generation read from the database (sessions
+    from subjects and assignments, the time-config grid and breaks, room pools,
+    availability and slots pinned by other timetables), so equal hashes mean
+    the same search.
+    """
+    data = asdict(problem)
+    # the fixed room a load just picked is already in the pools; whether it is saved yet is no input
+    del data["fixed_rooms"]
+    payload = {"version": CACHE_VERSION, "problem": data, "settings": settings}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def lookup(db: DbSession, key: str) -> Optional[Tuple[Solution, Optional[dict]]]:
+    # (solution, optimizer stats) of a cached solve, marking the entry as just used
+    if CACHE_SIZE <= 0:
+        return None
+    row = db.get(models.SolutionCache, key)
+    if row is None:
+        return None
+    row.hits = (row.hits or 0) + 1
+    row.used_at = datetime.utcnow()
+    data = json.loads(row.payload)
+    # JSON has no tuples: a rotation group's rooms come back as a list
+    placements = [None if p is None else (p[0], tuple(p[1]) if isinstance(p[1], list) else p[1])
+                  for p in data["placements"]]
+    solution = Solution(placements=placements, complete=data["complete"], nodes=data["nodes"], stopped=data["stopped"])
+    return solution, data.get("optimization")
+
+
+def store(db: DbSession, key: str, solution: Solution, optimized: Optional[dict] = None):
+    # only complete assignments are worth replaying; a cut-short search may do better next time.
+    # Written in the caller's transaction, so a failed generate caches nothing
+    if CACHE_SIZE <= 0 or not solution.complete:
+        return
+    payload = json.dumps({"placements": solution.placements, "complete": solution.complete, "nodes": solution.nodes,
+                          "stopped": solution.stopped, "optimization": optimized}, separators=(",", ":"))
+    C = models.SolutionCache
+    row = db.get(C, key)
+    if row is not None:
+        row.payload, row.used_at = payload, datetime.utcnow()
+    else:
+        try:
+            with db.begin_nested():
+                db.add(C(key=key, payload=payload))
+        except IntegrityError:
+            pass  # a concurrent run cached the same key first
+    excess = db.execute(select(func.count()).select_from(C)).scalar_one() - CACHE_SIZE
+    if excess > 0:
+        oldest = db.execute(select(C.key).order_by(C.used_at, C.created_at).limit(excess)).scalars().all()
+        db.execute(delete(C).where(C.key.in_(oldest)))
@@ -0,0 +1,174 @@
+import threading
+from collections import defaultdict
+from typing import Optional
+from .budget import Budget
+from .problem import Problem, Solution
+from .search import SearchSolver, finish
+from .state import SlotState, pick_room
+
+try:
+    from ortools.sat.python import cp_model
+except ImportError:  # optional: pip install ortools
+    cp_model = None
+
+# share of the time limit held back from CP-SAT for the MRV fallback, which runs when CP-SAT
+# runs out of time without a timetable
+FALLBACK_SHARE = 0.2
+
+
+class CpSatSolver:
+    """Exact backend: the problem as a CP-SAT model over interval variables.
+
+    Each session gets one start variable whose domain is its legal starts
+    (within a day, outside blocked slots), a fixed-size interval per teacher,
+    division and room it may use, and NoOverlap constraints per resource.
+    Rooms are chosen through one optional interval per room of the session's
+    pool, except in pools that share no room with another pool and hold no
+    blocked slot: there a cumulative constraint bounds how many sessions run
+    at once and rooms are handed out afterwards by interval partitioning,
+    which always succeeds under that bound. A rotation group has one start
+    and a teacher interval and room choice per batch. Once-per-day pairs take pairwise
+    different days; twins are ordered when symmetry breaking is on. The node
+    limit does not apply here. On several cores CP-SAT races its workers, so
+    two unseeded runs may return different valid timetables; with a seed it
+    runs one worker seeded with it, and a run that is not cut short by the
+    time limit repeats its answer. CP-SAT has no partial answer, so
+    when it runs out of time first the MRV search's best partial assignment
+    is returned instead, searched in the share of the time limit CP-SAT is
+    not given.
+    """
+
+    name = "cpsat"
+
+    def available(self) -> bool:
+        return cp_model is not None
+
+    def solve(self, problem: Problem, symmetry: bool = True, time_limit_ms: Optional[int] = None,
+              max_nodes: Optional[int] = None, on_progress=None, seed: Optional[int] = None) -> Solution:
+        budget = Budget(time_limit_ms, None, on_progress)
+        sessions = problem.sessions
+        state = SlotState(problem)
+        model = cp_model.CpModel()
+        used_pools = {p for s in sessions for p in s.pools}
+        pools_of_room = defaultdict(int)
+        for p in used_pools:
+            for r in problem.pools[p]:
+                pools_of_room[r] += 1
+        pooled = {p for p in used_pools
+                  if all(pools_of_room[r] == 1 and not state.room[r] for r in problem.pools[p])}
+        starts, intervals = [], []
+        by_teacher, by_division, by_room, by_pool = defaultdict(list), defaultdict(list), defaultdict(list), defaultdict(list)
+        room_choice = []
+        for i, s in enumerate(sessions):
+            legal = [slot for slot, mask, _ in problem.starts(s.length)
+                     if state.fits(s, mask) and pick_room(problem, state, s, mask) is not None]
+            if not legal:
+                # no start at all: nothing to prove, let the relaxed fill explain it
+                budget.stopped = "infeasible"
+                return finish(problem, False, [None] * len(sessions), budget)
+            start = model.new_int_var_from_domain(cp_model.Domain.from_values(legal), f"start{i}")
+            interval = model.new_fixed_size_interval_var(start, s.length, f"session{i}")
+            starts.append(start)
+            intervals.append(interval)
+            for t in s.teachers:
+                by_teacher[t].append(interval)
+            by_division[s.division].append(interval)
+            # one room choice per batch; batches of a group share the start, so room NoOverlap keeps them apart
+            choices = []
+            for k, pool in enumerate(s.pools):
+                choice = {}
+                choices.append(choice)
+                if pool in pooled:
+                    by_pool[pool].append(interval)
+                    continue
+                for r in problem.pools[pool]:
+                    used = model.new_bool_var(f"room{i}_{k}_{r}")
+                    choice[r] = used
+                    by_room[r].append(model.new_optional_fixed_size_interval_var(start, s.length, used, f"in{i}_{k}_{r}"))
+                model.add_exactly_one(choice.values())
+            room_choice.append(choices)
+
+        # slots other timetables already hold in a room
+        for r, blocked in enumerate(state.room):
+            if by_room[r]:
+                for slot in range(problem.slots):
+                    if blocked >> slot & 1:
+                        by_room[r].append(model.new_fixed_size_interval_var(slot, 1, f"blocked{r}_{slot}"))
+        for group in (by_teacher, by_division, by_room):
+            for members in group.values():
+                if len(members) > 1:
+                    model.add_no_overlap(members)
+        for p, members in by_pool.items():
+            model.add_cumulative(members, [1] * len(members), len(problem.pools[p]))
+
+        twice = set(problem.twice_allowed)
+        days = defaultdict(list)
+        for i, s in enumerate(sessions):
+            if s.pair not in twice:
+                day = model.new_int_var(0, problem.days - 1, f"day{i}")
+                model.add_division_equality(day, starts[i], problem.periods)
+                days[s.pair].append(day)
+        for members in days.values():
+            if len(members) > 1:
+                model.add_all_different(members)
+        if symmetry:
+            for i, prev in enumerate(problem.twins()):
+                if prev is not None:
+                    model.add(starts[prev] < starts[i])
+
+        solver = cp_model.CpSolver()
+        if seed is not None:
+            # one worker: several race each other, so their answer depends on thread timing
+            solver.parameters.random_seed = seed
+            solver.parameters.num_workers = 1
+        if budget.deadline is not None:
+            solver.parameters.max_time_in_seconds = budget.remaining_ms() * (1 - FALLBACK_SHARE) / 1000.0
+        # CP-SAT has no node hook: poll progress / cancellation from a side thread
+        done = threading.Event()
+
+        def watch():
+            while not done.wait(budget.progress_interval):
+                if budget.expired():
+                    solver.stop_search()
+                    return
+
+        watcher = threading.Thread(target=watch, daemon=True)
+        watcher.start()
+        try:
+            status = solver.solve(model)
+        finally:
+            done.set()
+            watcher.join()
+        budget.nodes = solver.num_branches
+        budget.counters.update(conflicts=solver.num_conflicts)
+
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            rooms = [[next((r for r, used in choice.items() if solver.value(used)), None) for choice in choices]
+                     for choices in room_choice]
+            # cumulative pools: earliest start first, each session takes the first room already free
+            free_at = {}
+            pending = [(solver.value(starts[i]), i, k) for i, s in enumerate(sessions)
+                       for k, pool in enumerate(s.pools) if pool in pooled]
+            for slot, i, k in sorted(pending):
+                s = sessions[i]
+                room = next(r for r in problem.pools[s.pools[k]] if free_at.get(r, 0) <= slot)
+                free_at[room] = slot + s.length
+                rooms[i][k] = room
+            placements = [(solver.value(starts[i]), tuple(rooms[i]) if s.batches else rooms[i][0])
+                          for i, s in enumerate(sessions)]
+            return finish(problem, True, placements, budget)
+        if status == cp_model.INFEASIBLE:
+            budget.stopped = "infeasible"
+            return finish(problem, False, [None] * len(sessions), budget)
+        if budget.stopped == "cancelled":
+            return finish(problem, False, [None] * len(sessions), budget)
+        # out of time with nothing to show: an MRV search over what is left of the budget keeps
+        # whatever it places (at least 1 ms: no limit at all would be 0)
+        remaining = budget.remaining_ms()
+        fallback = SearchSolver("mrv").solve(problem, symmetry, None if remaining is None else max(1, remaining),
+                                             max_nodes, on_progress)
+        if not fallback.complete:
+            fallback.stopped = fallback.stopped or "time_limit"
+        fallback.nodes += budget.nodes
+        fallback.stats = {**fallback.stats, "conflicts": solver.num_conflicts, "cpsat_timeouts": 1}
+        return fallback
@@ -0,0 +1,27 @@
+import random
+from typing import Dict, Optional
+from .base import Solver
+from .cpsat import CpSatSolver
+from .problem import Problem, Solution
+from .search import SearchSolver
+
+SOLVERS: Dict[str, Solver] = {
+    "backtrack": SearchSolver("backtrack"),
+    "mrv": SearchSolver("mrv"),
+    "cpsat": CpSatSolver(),
+}
+# engines usable in this install; cpsat needs the optional ortools package
+STRATEGIES = tuple(name for name, engine in SOLVERS.items() if engine.available())
+
+
+def solve(problem: Problem, strategy: str = "backtrack", seed: Optional[int] = None, **kwargs) -> Solution:
+    # kwargs: symmetry, time_limit_ms, max_nodes, on_progress (see Solver.solve). The engines
+    # are deterministic; a seed shuffles the days before the search, so each seed gives its own
+    # reproducible timetable
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown solver strategy: {strategy}")
+    if seed is None:
+        return SOLVERS[strategy].solve(problem, **kwargs)
+    order = list(range(problem.days))
+    random.Random(seed).shuffle(order)
+    return SOLVERS[strategy].solve(problem.relabel_days(order), seed=seed, **kwargs).relabel_days(order, problem.periods)
@@ -0,0 +1,267 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session as DbSession
+from .. import models
+from .problem import LAB, LECTURE, TUTORIAL, Problem, Session
+from .trace import Trace
+
+ROOM_TYPES = {LAB: models.RoomType.lab, TUTORIAL: models.RoomType.tutorial, LECTURE: models.RoomType.classroom}
+KINDS = (LECTURE, LAB, TUTORIAL)
+
+
+def load_time_config(db: DbSession, class_id: int, department_id=None) -> models.TimeConfig:
+    # Time config priority: class -> department -> default
+    cfg = db.query(models.TimeConfig).filter(models.TimeConfig.class_id == class_id).first()
+    if not cfg and department_id:
+        cfg = db.query(models.TimeConfig).filter(models.TimeConfig.department_id == department_id).first()
+    if not cfg:
+        cfg = models.TimeConfig()
+    return cfg
+
+
+def grid_size(cfg: models.TimeConfig) -> Tuple[int, int]:
+    working_days = min(max(cfg.working_days or 6, 5), 6)
+    periods_per_day = cfg.periods_per_day or 8
+    return working_days, periods_per_day
+
+
+def _fixed_room(db: DbSession, class_id: int, mode, claimed: Dict[int, int]) -> Optional[int]:
+    if mode != models.ModeType.school:
+        return None
+    cls = db.query(models.ClassGroup).get(class_id)
+    fixed_room_id = cls.fixed_room_id if cls else None
+    if cls and not fixed_room_id:
+        # pick the first classroom no other class holds (nor one picked earlier in this load) as
+        # fixed room. Only recorded in `claimed`: the database is not written while loading, the
+        # room is saved with the generated timetables. With none left the class's lectures use
+        # the department's classroom pool
+        C, R = models.ClassGroup, models.Room
+        taken = db.query(C.fixed_room_id).filter(C.fixed_room_id.is_not(None))
+        q = db.query(R).filter(R.type == models.RoomType.classroom, R.id.notin_(taken))
+        if claimed:
+            q = q.filter(R.id.notin_(list(claimed.values())))
+        if cls.department_id is not None:
+            q = q.filter((R.department_id == cls.department_id) | R.department_id.is_(None))
+        free_classroom = q.order_by(R.id).first()
+        if free_classroom:
+            fixed_room_id = free_classroom.id
+            claimed[class_id] = fixed_room_id
+    return fixed_room_id
+
+
+def _room_pool(rooms: List[models.Room], kind: str, department_id: Optional[int], strength: Optional[int]) -> List[int]:
+    # rooms a session of `kind` may use: the department's own and shared (no department) rooms
+    # large enough for the division. Rooms marked preferred_for the kind come first, then rooms
+    # of the matching type; within each, the smallest capacity that fits
+    ranked = []
+    for i, r in enumerate(rooms):
+        if department_id is not None and r.department_id not in (None, department_id):
+            continue
+        if strength and r.capacity and r.capacity < strength:
+            continue
+        preferred = r.preferred_for is not None and r.preferred_for.value == kind
+        if preferred or r.type == ROOM_TYPES[kind]:
+            ranked.append((not preferred, r.capacity is None, r.capacity or 0, i))
+    ranked.sort()
+    return [i for *_, i in ranked]
+
+
+def _batch_numbers(db: DbSession, divisions: List[models.Division], modes: Dict[int, object]) -> Dict[int, List[int]]:
+    # batches of every college division split for labs: its Batch rows, else 1..batch_count
+    stored = defaultdict(list)
+    batches = db.query(models.Batch).filter(models.Batch.division_id.in_([d.id for d in divisions])).order_by(models.Batch.number)
+    for b in batches:
+        stored[b.division_id].append(b.number)
+    out = {}
+    for d in divisions:
+        if getattr(modes[d.class_id], "value", modes[d.class_id]) == models.ModeType.school.value:
+            continue
+        numbers = stored.get(d.id) or list(range(1, (d.batch_count or 0) + 1))
+        if len(numbers) > 1:
+            out[d.id] = numbers
+    return out
+
+
+def _availability(db: DbSession, teacher_ids: List[int], days: int, periods: int) -> Tuple[List[int], List[int]]:
+    # (unavailable, disliked) masks per teacher on the problem grid, from one query
+    A = models.TeacherAvailability
+    position = {t: i for i, t in enumerate(teacher_ids)}
+    unavailable, disliked = [0] * len(teacher_ids), [0] * len(teacher_ids)
+    day_bits = (1 << periods) - 1
+    rows = db.query(A.teacher_id, A.day_index, A.unavailable, A.disliked).filter(A.teacher_id.in_(teacher_ids)).all() \
+        if teacher_ids else []  # masks are OR-ed, row order does not matter
+    for teacher_id, day, hard, soft in rows:
+        if day < days:
+            unavailable[position[teacher_id]] |= ((hard or 0) & day_bits) << (day * periods)
+            disliked[position[teacher_id]] |= ((soft or 0) & day_bits) << (day * periods)
+    return unavailable, disliked
+
+
+def _rotation(tracks: list, numbers: List[int]) -> List[Tuple[int, List[Tuple[int, int]]]]:
+    # lab rotation of one division: (rotation index, [(batch number, track index)]) per group.
+    # In rotation g batch k takes track (k + g) % size, so no two batches share a lab and, over
+    # `size` rotations, every batch meets every track once; a track with fewer sessions than
+    # others drops out of the later rounds, leaving its batch free
+    size = max(len(tracks), len(numbers))
+    rounds = max(count for _, _, count, _, _ in tracks)
+    groups = []
+    for r in range(rounds):
+        for g in range(size):
+            members = [(n, (k + g) % size) for k, n in enumerate(numbers)
+                       if (k + g) % size < len(tracks) and r < tracks[(k + g) % size][2]]
+            if members:
+                groups.append((g, members))
+    return groups
+
+
+def build_problem(db: DbSession, class_id: int, department_id=None, mode=None, trace: Optional[Trace] = None) -> Problem:
+    return build_joint_problem(db, [(class_id, department_id, mode)], trace)
+
+
+def build_joint_problem(db: DbSession, scopes: List[Tuple[int, Optional[int], object]],
+                        trace: Optional[Trace] = None) -> Problem:
+    # one problem over the divisions of several classes; scopes are (class_id, department_id, mode).
+    # A trace gets the queries booked as "load" and building the sessions as "expand"
+    class_ids = [c for c, _, _ in scopes]
+    divisions = db.query(models.Division).filter(models.Division.class_id.in_(class_ids)).order_by(
+        models.Division.class_id, models.Division.index).all()
+    divisions.sort(key=lambda d: class_ids.index(d.class_id))
+    # every query is ordered: session, teacher and room indexes (and so the search) must not
+    # depend on the order the database happens to return rows in
+    subjects = db.query(models.Subject).filter(models.Subject.class_id.in_(class_ids)).order_by(models.Subject.id).all()
+    assignments = db.query(models.SubjectTeacher).filter(
+        models.SubjectTeacher.division_id.in_([d.id for d in divisions])).order_by(models.SubjectTeacher.id).all()
+    configs = {c: load_time_config(db, c, dept) for c, dept, _ in scopes}
+    grids = {c: grid_size(cfg) for c, cfg in configs.items()}
+    days = max((g[0] for g in grids.values()), default=6)
+    periods = max((g[1] for g in grids.values()), default=8)
+    claimed: Dict[int, int] = {}
+    fixed = {c: _fixed_room(db, c, mode, claimed) for c, _, mode in scopes}
+    batch_numbers = _batch_numbers(db, divisions, {c: mode for c, _, mode in scopes})
+
+    all_rooms = db.query(models.Room).order_by(models.Room.id).all()
+    room_ids = [r.id for r in all_rooms]
+    if trace is not None:
+        trace.lap("load")
+    departments = {c: dept for c, dept, _ in scopes}
+    # one pool per (kind, department, division strength) bucket, built on first use
+    pools, pool_of = [], {}
+
+    def pool_for(kind, department_id, strength):
+        key = (kind, department_id, strength)
+        if key not in pool_of:
+            pool_of[key] = len(pools)
+            pools.append(_room_pool(all_rooms, kind, department_id, strength))
+        return pool_of[key]
+
+    for c, room_id in fixed.items():
+        if room_id in room_ids:
+            pool_of[(c, LECTURE)] = len(pools)
+            pools.append([room_ids.index(room_id)])
+
+    # slots a division can never use: days/periods outside its class grid, and break periods
+    division_blocked = []
+    for d in divisions:
+        cfg = configs[d.class_id]
+        class_days, class_periods = grids[d.class_id]
+        breaks = {p for p in (cfg.short_break_after_period, cfg.lunch_break_after_period) if p is not None}
+        mask = 0
+        for day in range(days):
+            for period in range(periods):
+                if day >= class_days or period >= class_periods or period in breaks:
+                    mask |= 1 << (day * periods + period)
+        division_blocked.append(mask)
+
+    # Requirement: subject hours per division, flattened per session
+    assign_map = {(a.division_id, a.subject_id): a.teacher_id for a in assignments}
+    div_index = {d.id: i for i, d in enumerate(divisions)}
+    teacher_ids, teacher_index = [], {}
+    pairs, twice_allowed, sessions = [], [], []
+
+    def add_pair(div_id, subject_id, twice):
+        pairs.append((div_id, subject_id))
+        if twice:
+            twice_allowed.append(len(pairs) - 1)
+        return len(pairs) - 1
+
+    # labs of divisions split into batches, per division: (subject id, teacher, sessions, length, twice allowed)
+    lab_tracks = defaultdict(list)
+    for s in subjects:
+        cfg = configs[s.class_id]
+        lab_len = max(1, int((cfg.lab_minutes or 120) / max(1, (cfg.lecture_minutes or 60))))
+        for d in divisions:
+            if d.class_id != s.class_id:
+                continue
+            t_id = assign_map.get((d.id, s.id))
+            if not t_id:
+                # no teacher for this division+subject; skip (do not borrow from other divisions)
+                continue
+            slots = int(s.hours_per_week or 0)
+            if slots <= 0:
+                continue
+            if t_id not in teacher_index:
+                teacher_index[t_id] = len(teacher_ids)
+                teacher_ids.append(t_id)
+            twice = bool(cfg.allow_subject_twice_in_day or s.can_be_twice_in_day)
+            kind = s.type.value if hasattr(s.type, "value") else str(s.type)
+            if kind == LAB:
+                # hours_per_week counts periods; each lab session spans lab_minutes worth of periods
+                count, length = max(1, slots // lab_len), lab_len
+            else:
+                count, length = slots, 1
+            if kind == LAB and d.id in batch_numbers:
+                lab_tracks[d.id].append((s.id, teacher_index[t_id], count, length, twice))
+                continue
+            pair = add_pair(d.id, s.id, twice)
+            pool = pool_of.get((s.class_id, kind))
+            if pool is None:
+                pool = pool_for(kind, departments[s.class_id], d.strength)
+            for _ in range(count):
+                sessions.append(Session(div_index[d.id], s.id, teacher_index[t_id], kind, length, pair, pool))
+
+    # batched labs run as rotation groups: the batches take different labs side by side, each in a
+    # room sized for a batch, and the whole group is placed as one session
+    for d in divisions:
+        tracks = lab_tracks.get(d.id)
+        if not tracks:
+            continue
+        department_id = departments[d.class_id]
+        if len(tracks) < 2 or len({t for _, t, *_ in tracks}) < len(tracks):
+            # one lab, or a teacher with two of them, cannot rotate: whole-division labs as before
+            pool = pool_for(LAB, department_id, d.strength)
+            for subject_id, t, count, length, twice in tracks:
+                pair = add_pair(d.id, subject_id, twice)
+                sessions.extend(Session(div_index[d.id], subject_id, t, LAB, length, pair, pool) for _ in range(count))
+            continue
+        numbers = batch_numbers[d.id]
+        strength = -(-d.strength // len(numbers)) if d.strength else None
+        pool = pool_for(LAB, department_id, strength)
+        # a rotation index repeats the same lab for each batch, so it is the once-per-day pair
+        rotation_pairs = {}
+        for g, members in _rotation(tracks, numbers):
+            if g not in rotation_pairs:
+                rotation_pairs[g] = add_pair(d.id, tracks[members[0][1]][0], all(tracks[k][4] for _, k in members))
+            batches = tuple((n, tracks[k][0], tracks[k][1], pool) for n, k in members)
+            first = tracks[members[0][1]]
+            sessions.append(Session(div_index[d.id], first[0], first[1], LAB, first[3], rotation_pairs[g], pool, batches))
+
+    if trace is not None:
+        trace.lap("expand")
+    unavailable, disliked = _availability(db, teacher_ids, days, periods)
+    if trace is not None:
+        trace.lap("load")
+    return Problem(
+        days=days,
+        periods=periods,
+        sessions=sessions,
+        division_ids=[d.id for d in divisions],
+        teacher_ids=teacher_ids,
+        room_ids=room_ids,
+        pools=pools,
+        division_blocked=division_blocked,
+        teacher_unavailable=unavailable,
+        teacher_disliked=disliked,
+        twice_allowed=twice_allowed,
+        pairs=pairs,
+        fixed_rooms=claimed,
+    )
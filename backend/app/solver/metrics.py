@@ -0,0 +1,143 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session as DbSession
+from .. import models
+from .loader import grid_size, load_time_config
+from .problem import Problem
+
+# an entry row: (division id, subject id, teacher id, room id or None, day, period, batch number or None)
+Row = Tuple[int, int, int, Optional[int], int, int, Optional[int]]
+
+
+class TimetableArrays:
+    """Dense occupancy counts of a set of entries, one array per resource.
+
+    ``division``, ``teacher`` and ``room`` have shape (resource, day, period)
+    and count the entries holding each slot, so clashes are simply counts
+    above one. Batches of a division running side by side count once in
+    ``division``; two entries of the same batch are counted in
+    ``batch_clashes``. ``pair`` does the same per (division, subject, batch),
+    with batch -1 for whole-division entries.
+    """
+
+    def __init__(self, rows: Sequence[Row], days: int, periods: int):
+        # a missing room or batch comes through as NaN and becomes -1
+        data = np.nan_to_num(np.array(rows, dtype=np.float64).reshape(-1, 7), nan=-1).astype(np.int64)
+        # drop entries outside the grid rather than fail on an old, larger config
+        data = data[(data[:, 4] < days) & (data[:, 5] < periods)]
+        self.days, self.periods = days, periods
+        self.entries = len(data)
+        self.division_ids, div = np.unique(data[:, 0], return_inverse=True)
+        self.teacher_ids, teacher = np.unique(data[:, 2], return_inverse=True)
+        has_room = data[:, 3] >= 0
+        self.room_ids, room = np.unique(data[has_room, 3], return_inverse=True)
+        pairs, pair = np.unique(data[:, [0, 1, 6]], axis=0, return_inverse=True)
+        self.pair_ids = pairs.reshape(-1, 3)
+        day, period = data[:, 4], data[:, 5]
+        batched = data[:, 6] >= 0
+        # one unit per whole-division entry plus one per slot where any batch is busy
+        cells, repeats = np.unique(np.stack([div[batched], day[batched], period[batched], data[batched, 6]], axis=1),
+                                   axis=0, return_counts=True)
+        self.batch_clashes = int((repeats - 1).sum())
+        busy = np.unique(cells[:, :3], axis=0).reshape(-1, 3)
+        self.division = self._count(len(self.division_ids), div[~batched], day[~batched], period[~batched])
+        np.add.at(self.division, (busy[:, 0], busy[:, 1], busy[:, 2]), 1)
+        self.teacher = self._count(len(self.teacher_ids), teacher, day, period)
+        self.room = self._count(len(self.room_ids), room, day[has_room], period[has_room])
+        self.pair = self._count(len(self.pair_ids), pair.reshape(-1), day, period)
+
+    def _count(self, n: int, index, day, period) -> np.ndarray:
+        out = np.zeros((n, self.days, self.periods), dtype=np.int32)
+        np.add.at(out, (index, day, period), 1)
+        return out
+
+    @classmethod
+    def from_solution(cls, problem: Problem, placements) -> "TimetableArrays":
+        # the same view of an in-memory assignment, for optimizers and benchmarks
+        rows: List[Row] = []
+        for s, placement in zip(problem.sessions, placements):
+            if placement is None:
+                continue
+            slot, room = placement
+            day, period = problem.day_period(slot)
+            if s.batches:
+                parts = [(n, subject, t, r) for (n, subject, t, _), r in zip(s.batches, room)]
+            else:
+                parts = [(None, s.subject, s.teacher, room)]
+            for batch, subject, t, r in parts:
+                room_id = problem.room_ids[r] if r is not None else None
+                for k in range(s.length):
+                    rows.append((problem.division_ids[s.division], subject, problem.teacher_ids[t], room_id, day, period + k, batch))
+        return cls(rows, problem.days, problem.periods)
+
+
+def _clashes(counts: np.ndarray) -> int:
+    return int(np.clip(counts - 1, 0, None).sum())
+
+
+def _gaps(busy: np.ndarray) -> np.ndarray:
+    # idle periods between the first and last busy period of every (resource, day)
+    periods = busy.shape[-1]
+    any_busy = busy.any(axis=-1)
+    first = busy.argmax(axis=-1)
+    last = periods - 1 - busy[..., ::-1].argmax(axis=-1)
+    return np.where(any_busy, last - first + 1 - busy.sum(axis=-1), 0)
+
+
+def evaluate(arrays: TimetableArrays) -> dict:
+    teacher_busy = arrays.teacher > 0
+    daily_load = teacher_busy.sum(axis=2)
+    gaps = _gaps(teacher_busy)
+    # subject spread counts runs (a lab or back-to-back lectures is one sitting), not periods
+    pair_busy = arrays.pair > 0
+    starts = pair_busy.copy()
+    starts[:, :, 1:] &= ~pair_busy[:, :, :-1]
+    per_day = starts.sum(axis=2)
+    same_day = (per_day * (per_day - 1) // 2).sum(axis=1)
+    adjacent = ((per_day[:, :-1] > 0) & (per_day[:, 1:] > 0)).sum(axis=1)
+    room_used = (arrays.room > 0).sum(axis=(1, 2))
+    slots = arrays.days * arrays.periods
+    return {
+        "days": arrays.days,
+        "periods": arrays.periods,
+        "entries": arrays.entries,
+        "clashes": {
+            "division": _clashes(arrays.division) + arrays.batch_clashes,
+            "teacher": _clashes(arrays.teacher),
+            "room": _clashes(arrays.room),
+        },
+        "teacher_gaps": int(gaps.sum()),
+        "teachers": [
+            {"teacher_id": int(t), "daily_load": load.tolist(), "gaps": int(g)}
+            for t, load, g in zip(arrays.teacher_ids, daily_load, gaps.sum(axis=1))
+        ],
+        "subject_spread": {
+            "same_day": int(same_day.sum()),
+            "adjacent_days": int(adjacent.sum()),
+            "subjects": [
+                {"division_id": int(d), "subject_id": int(s), "batch_number": int(b) if b >= 0 else None,
+                 "sittings": int(n), "days_used": int(u), "same_day": int(r)}
+                for (d, s, b), n, u, r in zip(arrays.pair_ids, per_day.sum(axis=1), (per_day > 0).sum(axis=1), same_day)
+            ],
+        },
+        "room_utilisation": round(float(room_used.sum()) / (len(arrays.room_ids) * slots), 4) if len(arrays.room_ids) else 0.0,
+        "rooms": [
+            {"room_id": int(r), "used_periods": int(u), "utilisation": round(float(u) / slots, 4)}
+            for r, u in zip(arrays.room_ids, room_used)
+        ],
+    }
+
+
+def load_arrays(db: DbSession, timetable_ids: Iterable[int], days: int, periods: int) -> TimetableArrays:
+    E = models.TimetableEntry
+    rows = db.execute(select(E.division_id, E.subject_id, E.teacher_id, E.room_id, E.day_index, E.period_index, E.batch_number)
+                      .where(E.timetable_id.in_(list(timetable_ids)))).all()
+    return TimetableArrays(rows, days, periods)
+
+
+def timetable_metrics(db: DbSession, tt: models.Timetable) -> Dict:
+    days, periods = grid_size(load_time_config(db, tt.class_id, tt.department_id))
+    out = evaluate(load_arrays(db, [tt.id], days, periods))
+    out["timetable_id"] = tt.id
+    return out
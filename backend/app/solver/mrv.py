@@ -0,0 +1,299 @@
+from collections import Counter, defaultdict
+from typing import List, Optional, Tuple
+from .budget import Budget
+from .problem import Problem, placed_rooms
+from .state import SlotState, iter_bits, pick_room
+
+
+def spread(mask: int, length: int) -> int:
+    # start slots whose `length`-period span would touch a bit of `mask`
+    out = mask
+    for k in range(1, length):
+        out |= mask >> k
+    return out
+
+
+class Domains:
+    """Legal start slots of every session, one bitmask each, kept in sync with a SlotState.
+
+    ``assign`` places a session and forward-checks its neighbours (sessions that
+    share a teacher or division, plus sessions whose room pool holds the room taken);
+    every overwritten domain goes on a trail so ``unassign`` can restore it.
+    Besides empty domains, a placement is rejected when a teacher or division has
+    fewer free periods left than it still needs, or a once-per-day subject has
+    fewer free days than sessions left.
+    """
+
+    def __init__(self, problem: Problem, state: SlotState, symmetry: bool = True):
+        self.problem = problem
+        self.state = state
+        sessions = problem.sessions
+        # twins are placed in increasing slot order: each one starts after its predecessor
+        self.twin = problem.twins() if symmetry else [None] * len(sessions)
+        self.slot_of: List[Optional[int]] = [None] * len(sessions)
+        self.lengths = sorted({s.length for s in sessions})
+        self.starts = {n: {slot: (mask, day_bit) for slot, mask, day_bit in problem.starts(n)} for n in self.lengths}
+        self.legal = {n: sum(1 << slot for slot in self.starts[n]) for n in self.lengths}
+        day_mask = ((1 << problem.periods) - 1)
+        self.day_expand = [
+            sum(day_mask << (d * problem.periods) for d in range(problem.days) if bits >> d & 1)
+            for bits in range(1 << problem.days)
+        ]
+        self.twice = set(problem.twice_allowed)
+
+        # resources per session: one teacher and pool, or one per batch of a rotation group
+        self.teachers = [s.teachers for s in sessions]
+        self.room_keys = [[(p, s.length) for p in s.pools] for s in sessions]
+        by_teacher, by_division, self.by_pool = defaultdict(set), defaultdict(set), defaultdict(list)
+        for i, s in enumerate(sessions):
+            for t in self.teachers[i]:
+                by_teacher[t].add(i)
+            by_division[s.division].add(i)
+            for p in s.pools:
+                self.by_pool[p].append(i)
+        self.pools_of_room = defaultdict(list)
+        for p, pool in enumerate(problem.pools):
+            for r in pool:
+                self.pools_of_room[r].append(p)
+        self.neighbours = [sorted(set().union(by_division[s.division], *(by_teacher[t] for t in self.teachers[i])) - {i})
+                           for i, s in enumerate(sessions)]
+        self.by_teacher, self.by_division = by_teacher, by_division
+        by_pair = defaultdict(set)
+        for i, s in enumerate(sessions):
+            if s.pair not in self.twice:
+                by_pair[s.pair].add(i)
+        self.by_pair = by_pair
+        self.day_masks = [day_mask << (d * problem.periods) for d in range(problem.days)]
+
+        self.rooms = {key: 0 for keys in self.room_keys for key in keys}
+        for key in self.rooms:
+            self.rooms[key] = self._room_ok(*key)
+        self.dom = [self.compute(i) for i in range(len(sessions))]
+        self.unassigned = set(range(len(sessions)))
+        self.trail: List[Tuple[dict, object, int]] = []
+        # placements undone by forward checking: a neighbour left with no start, or a counting bound broken
+        self.rejected: Counter = Counter()
+
+    def _room_ok(self, pool: int, length: int) -> int:
+        # start slots where at least one room of the pool is free for the whole span
+        row = self.state.free[pool]
+        ok = 0
+        for slot in range(len(row) - length + 1):
+            avail = row[slot]
+            for k in range(1, length):
+                avail &= row[slot + k]
+            if avail:
+                ok |= 1 << slot
+        return ok
+
+    def compute(self, i: int) -> int:
+        s = self.problem.sessions[i]
+        state = self.state
+        busy = state.division[s.division]
+        for t in self.teachers[i]:
+            busy |= state.teacher[t]
+        dom = self.legal[s.length] & ~spread(busy, s.length)
+        for key in self.room_keys[i]:
+            # a rotation group needs a room in each batch's pool; distinct rooms are checked on placement
+            dom &= self.rooms[key]
+        if s.pair not in self.twice:
+            dom &= ~self.day_expand[state.pair_days[s.pair]]
+        prev = self.twin[i]
+        if prev is not None and self.slot_of[prev] is not None:
+            dom &= -(2 << self.slot_of[prev])
+        return dom
+
+    def _covered(self, members) -> Tuple[int, int]:
+        # (periods still needed, periods reachable) over the unassigned sessions of a group
+        sessions, dom = self.problem.sessions, self.dom
+        need, reach = 0, 0
+        for j in members:
+            if j in self.unassigned:
+                n = sessions[j].length
+                need += n
+                reach |= spread(dom[j] << (n - 1), n)
+        return need, reach.bit_count()
+
+    def _consistent(self, changed) -> bool:
+        sessions, dom = self.problem.sessions, self.dom
+        teachers = {t for j in changed for t in self.teachers[j]}
+        divisions = {sessions[j].division for j in changed}
+        pairs = {sessions[j].pair for j in changed if sessions[j].pair in self.by_pair}
+        for t in teachers:
+            need, reach = self._covered(self.by_teacher[t])
+            if need > reach:
+                return False
+        for d in divisions:
+            need, reach = self._covered(self.by_division[d])
+            if need > reach:
+                return False
+        for pair in pairs:
+            left = [j for j in self.by_pair[pair] if j in self.unassigned]
+            if left:
+                # each needs a day of its own among the days some of them can still start on;
+                # sessions of a pair need not be twins (rotation rounds differ in length or
+                # batches), so no one domain stands for the others
+                reach = 0
+                for j in left:
+                    reach |= dom[j]
+                days = sum(1 for m in self.day_masks if reach & m)
+                if len(left) > days:
+                    return False
+        return True
+
+    def select(self) -> int:
+        # most constrained first. Sessions of one (division, subject) pair are interchangeable,
+        # so a pair is as tight as its free slots (or free days, when once-per-day) minus the
+        # sessions it still has to place; raw domain size, longer sessions and index break ties
+        # (the index tie-break also hands out twins in order, as symmetry breaking expects)
+        sessions, dom = self.problem.sessions, self.dom
+        left = defaultdict(int)
+        for j in self.unassigned:
+            left[sessions[j].pair] += 1
+
+        def key(j):
+            s = sessions[j]
+            size = dom[j].bit_count()
+            if s.pair in self.by_pair:
+                free = sum(1 for m in self.day_masks if dom[j] & m)
+            else:
+                free = size
+            return (free - left[s.pair], size, -s.length, j)
+
+        return min(self.unassigned, key=key)
+
+    def values(self, i: int) -> List[int]:
+        # least constraining start first: fewest neighbour start slots removed
+        sessions, dom = self.problem.sessions, self.dom
+        s = sessions[i]
+        live = [j for j in self.neighbours[i] if j in self.unassigned]
+        strict = s.pair in self.by_pair
+        masks = self.starts[s.length]
+        scored = []
+        for slot in iter_bits(dom[i]):
+            mask, day_bit = masks[slot]
+            day = self.day_expand[day_bit] if strict else 0
+            cost = 0
+            for j in live:
+                removed = spread(mask, sessions[j].length)
+                if sessions[j].pair == s.pair:
+                    removed |= day
+                cost += (dom[j] & removed).bit_count()
+            scored.append((cost, slot))
+        scored.sort()
+        return [slot for _, slot in scored]
+
+    def _set(self, store, key, value):
+        self.trail.append((store, key, store[key]))
+        store[key] = value
+
+    def assign(self, i: int, slot: int, room) -> Tuple[int, bool]:
+        s = self.problem.sessions[i]
+        mask, day_bit = self.starts[s.length][slot]
+        self.state.place(s, mask, day_bit, room)
+        self.unassigned.discard(i)
+        self.slot_of[i] = slot
+        mark = len(self.trail)
+        affected = list(self.neighbours[i])
+        hit = {p for r in placed_rooms(room) for p in self.pools_of_room[r]}
+        if hit:
+            for key in self.rooms:
+                if key[0] in hit:
+                    new = self._room_ok(*key)
+                    if new != self.rooms[key]:
+                        self._set(self.rooms, key, new)
+                        affected.extend(self.by_pool[key[0]])
+        changed = [i]
+        for j in affected:
+            if j not in self.unassigned:
+                continue
+            new = self.compute(j)
+            if new != self.dom[j]:
+                self._set(self.dom, j, new)
+                if not new:
+                    self.rejected["rejected_wipeout"] += 1
+                    return mark, False
+                changed.append(j)
+        if not self._consistent(changed):
+            self.rejected["rejected_bound"] += 1
+            return mark, False
+        return mark, True
+
+    def unassign(self, i: int, slot: int, room, mark: int):
+        s = self.problem.sessions[i]
+        mask, day_bit = self.starts[s.length][slot]
+        while len(self.trail) > mark:
+            store, key, old = self.trail.pop()
+            store[key] = old
+        self.state.undo(s, mask, day_bit, room)
+        self.unassigned.add(i)
+        self.slot_of[i] = None
+
+
+def search_mrv(problem: Problem, state: SlotState, placements: List[Optional[Tuple[int, Optional[int]]]],
+               budget: Budget, symmetry: bool = True) -> Tuple[bool, list]:
+    # most-remaining-values search with forward checking and least-constraining value order.
+    # Returns (solved, deepest partial assignment seen).
+    best, best_depth = list(placements), 0
+    domains = Domains(problem, state, symmetry)
+    if any(not d for d in domains.dom) or not domains._consistent(range(len(domains.dom))):
+        return False, best
+    sessions = problem.sessions
+    n = len(sessions)
+    # explicit stack of choice points: session, ordered values, resume position, trail mark
+    picked = [0] * n
+    values: List[List[int]] = [[]] * n
+    pos = [0] * n
+    marks: List[Optional[int]] = [None] * n
+    no_room = backtracks = 0
+    exhausted = False
+
+    depth = 0
+    if n:
+        picked[0] = domains.select()
+        values[0] = domains.values(picked[0])
+    while 0 <= depth < n:
+        i = picked[depth]
+        if marks[depth] is not None:
+            slot, room = placements[i]
+            domains.unassign(i, slot, room, marks[depth])
+            placements[i] = None
+            marks[depth] = None
+        vals = values[depth]
+        while pos[depth] < len(vals):
+            # an MRV node costs far more than a clock read, so the clock is read on every one
+            # rather than every 64 as spend() does: a short budget (the CP-SAT fallback's) holds
+            if not budget.spend(depth) or budget.expired():
+                exhausted = True
+                break
+            slot = vals[pos[depth]]
+            pos[depth] += 1
+            mask = domains.starts[sessions[i].length][slot][0]
+            room = pick_room(problem, state, sessions[i], mask)
+            if room is None:
+                # only a rotation group can miss here: a room per pool, but not distinct ones
+                no_room += 1
+                continue
+            mark, ok = domains.assign(i, slot, room)
+            placements[i] = (slot, room)
+            marks[depth] = mark
+            if ok:
+                break
+            domains.unassign(i, slot, room, mark)
+            placements[i] = None
+            marks[depth] = None
+        if exhausted:
+            break
+        if marks[depth] is not None:
+            depth += 1
+            if depth > best_depth:
+                best, best_depth = list(placements), depth
+            if depth < n:
+                picked[depth] = domains.select()
+                values[depth] = domains.values(picked[depth])
+                pos[depth] = 0
+        else:
+            depth -= 1
+            backtracks += 1
+    budget.counters.update(domains.rejected, backtracks=backtracks, room_pick_failed=no_room)
+    return not exhausted and depth >= n, best
@@ -0,0 +1,108 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from .. import models
+from .problem import Problem
+
+SCOPES = ("published", "all", "none")
+STRIDE = 32  # bits per day in stored masks, independent of any class's periods_per_day
+
+
+class OccupancyIndex:
+    """Teacher and room slots already taken by stored timetables, split per class.
+
+    Masks use a fixed stride of 32 periods per day so one index serves classes
+    with different time configs; ``seed`` re-packs them onto a problem's grid.
+    """
+
+    def __init__(self):
+        self.teacher: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))  # class -> teacher -> mask
+        self.room: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))  # class -> room -> mask
+
+    def add(self, class_id: int, teacher_id: int, room_id: Optional[int], day: int, period: int):
+        if period >= STRIDE:
+            return
+        bit = 1 << (day * STRIDE + period)
+        self.teacher[class_id][teacher_id] |= bit
+        if room_id is not None:
+            self.room[class_id][room_id] |= bit
+
+    def _repack(self, mask: int, problem: Problem) -> int:
+        out = 0
+        day_bits = (1 << problem.periods) - 1
+        for day in range(problem.days):
+            out |= ((mask >> (day * STRIDE)) & day_bits) << (day * problem.periods)
+        return out
+
+    def seed(self, problem: Problem, exclude_class_ids: Iterable[int] = ()) -> int:
+        # pre-occupy problem.teacher_blocked / room_blocked; returns how many slots were seeded
+        skip = set(exclude_class_ids)
+        teacher_pos = {t: i for i, t in enumerate(problem.teacher_ids)}
+        room_pos = {r: i for i, r in enumerate(problem.room_ids)}
+        teacher_blocked = list(problem.teacher_blocked) or [0] * len(problem.teacher_ids)
+        room_blocked = list(problem.room_blocked) or [0] * len(problem.room_ids)
+        for class_id, masks in self.teacher.items():
+            if class_id in skip:
+                continue
+            for teacher_id, mask in masks.items():
+                if teacher_id in teacher_pos:
+                    teacher_blocked[teacher_pos[teacher_id]] |= self._repack(mask, problem)
+        for class_id, masks in self.room.items():
+            if class_id in skip:
+                continue
+            for room_id, mask in masks.items():
+                if room_id in room_pos:
+                    room_blocked[room_pos[room_id]] |= self._repack(mask, problem)
+        problem.teacher_blocked = teacher_blocked
+        problem.room_blocked = room_blocked
+        return sum(m.bit_count() for m in teacher_blocked) + sum(m.bit_count() for m in room_blocked)
+
+
+_cache: Dict[Tuple[Optional[int], str], Tuple[tuple, OccupancyIndex]] = {}
+_lock = threading.Lock()
+
+
+def _scoped(stmt, department_id: Optional[int], scope: str):
+    if department_id is None:
+        stmt = stmt.where(models.Timetable.department_id.is_(None))
+    else:
+        stmt = stmt.where(models.Timetable.department_id == department_id)
+    if scope == "published":
+        stmt = stmt.where(models.Timetable.published.is_(True))
+    return stmt
+
+
+def load_occupancy(db: Session, department_id: Optional[int], scope: str = "published") -> OccupancyIndex:
+    # cached per (department, scope); a cheap count/max-id fingerprint catches writes made by
+    # other processes (job workers) that never called invalidate_occupancy here
+    if scope not in SCOPES:
+        raise ValueError(f"Unknown occupancy scope '{scope}', expected one of {list(SCOPES)}")
+    if scope == "none":
+        return OccupancyIndex()
+    E, T = models.TimetableEntry, models.Timetable
+    fingerprint = tuple(db.execute(
+        _scoped(select(func.count(E.id), func.max(E.id)).join(T, T.id == E.timetable_id), department_id, scope)
+    ).one())
+    key = (department_id, scope)
+    with _lock:
+        cached = _cache.get(key)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+    index = OccupancyIndex()
+    rows = db.execute(_scoped(
+        select(T.class_id, E.teacher_id, E.room_id, E.day_index, E.period_index).join(T, T.id == E.timetable_id),
+        department_id, scope,
+    ))
+    for class_id, teacher_id, room_id, day, period in rows:
+        index.add(class_id, teacher_id, room_id, day, period)
+    with _lock:
+        _cache[key] = (fingerprint, index)
+    return index
+
+
+def invalidate_occupancy(department_id: Optional[int] = None):
+    with _lock:
+        for key in [k for k in _cache if k[0] == department_id]:
+            _cache.pop(key, None)
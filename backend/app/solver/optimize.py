@@ -0,0 +1,234 @@
+import math
+import random
+import time
+from collections import defaultdict
+from dataclasses import replace
+from typing import Dict, Iterable, List, Optional, Tuple
+from .problem import LAB, Problem, Solution
+from .state import SlotState, pick_room
+
+# penalty per occurrence of each soft constraint
+WEIGHTS = {"teacher_gaps": 1, "same_day": 3, "adjacent_days": 1, "lab_end_of_day": 2, "disliked_slots": 2}
+
+
+class Scorer:
+    """Soft-constraint cost of an assignment, split into local terms.
+
+    Teacher gaps are scored per (teacher, day), subject spread per (division,
+    subject) pair, lab-at-end-of-day and periods in a teacher's disliked slots
+    per session, so a move only re-scores the few terms it touches.
+    """
+
+    def __init__(self, problem: Problem, state: SlotState, slot_of: List[Optional[int]]):
+        self.problem = problem
+        self.state = state
+        self.slot_of = slot_of
+        self.day_bits = (1 << problem.periods) - 1
+        self.by_pair = defaultdict(list)
+        for i, s in enumerate(problem.sessions):
+            self.by_pair[s.pair].append(i)
+        # last period each division can use on each day; a lab ending there ends the day
+        self.last_period = []
+        for d in range(len(problem.division_ids)):
+            blocked = problem.division_blocked[d] if problem.division_blocked else 0
+            row = []
+            for day in range(problem.days):
+                free = ~(blocked >> (day * problem.periods)) & self.day_bits
+                row.append(free.bit_length() - 1)
+            self.last_period.append(row)
+
+    def gaps(self, teacher: int, day: int) -> int:
+        busy = (self.state.teacher[teacher] >> (day * self.problem.periods)) & self.day_bits
+        if not busy:
+            return 0
+        span = busy.bit_length() - (busy & -busy).bit_length() + 1
+        return span - busy.bit_count()
+
+    def spread(self, pair: int) -> Tuple[int, int]:
+        # (same-day repeats, sessions on back-to-back days) of one pair
+        per_day = [0] * self.problem.days
+        for i in self.by_pair[pair]:
+            if self.slot_of[i] is not None:
+                per_day[self.slot_of[i] // self.problem.periods] += 1
+        same = sum(c * (c - 1) // 2 for c in per_day)
+        adjacent = sum(1 for a, b in zip(per_day, per_day[1:]) if a and b)
+        return same, adjacent
+
+    def lab_end(self, i: int) -> int:
+        s = self.problem.sessions[i]
+        slot = self.slot_of[i]
+        if s.kind != LAB or slot is None:
+            return 0
+        day, period = divmod(slot, self.problem.periods)
+        return int(period + s.length - 1 >= self.last_period[s.division][day])
+
+    def disliked(self, i: int) -> int:
+        s = self.problem.sessions[i]
+        slot = self.slot_of[i]
+        if slot is None or not self.problem.teacher_disliked:
+            return 0
+        mask = ((1 << s.length) - 1) << slot
+        return sum((self.problem.teacher_disliked[t] & mask).bit_count() for t in s.teachers)
+
+    def terms(self, moved: Iterable[int], slots: Iterable[int]):
+        # the (teacher, day) pairs, pairs and sessions whose cost a move of `moved` between `slots` can change
+        sessions, periods = self.problem.sessions, self.problem.periods
+        days = {slot // periods for slot in slots}
+        teacher_days = {(t, day) for i in moved for t in sessions[i].teachers for day in days}
+        return teacher_days, {sessions[i].pair for i in moved}, list(moved)
+
+    def local(self, teacher_days, pairs, moved) -> int:
+        cost = WEIGHTS["teacher_gaps"] * sum(self.gaps(t, day) for t, day in teacher_days)
+        for pair in pairs:
+            same, adjacent = self.spread(pair)
+            cost += WEIGHTS["same_day"] * same + WEIGHTS["adjacent_days"] * adjacent
+        cost += WEIGHTS["disliked_slots"] * sum(self.disliked(i) for i in moved)
+        return cost + WEIGHTS["lab_end_of_day"] * sum(self.lab_end(i) for i in moved)
+
+    def breakdown(self) -> Dict[str, int]:
+        problem = self.problem
+        out = {
+            "teacher_gaps": sum(self.gaps(t, day) for t in range(len(problem.teacher_ids)) for day in range(problem.days)),
+            "same_day": 0,
+            "adjacent_days": 0,
+            "lab_end_of_day": sum(self.lab_end(i) for i in range(len(problem.sessions))),
+            "disliked_slots": sum(self.disliked(i) for i in range(len(problem.sessions))),
+        }
+        for pair in self.by_pair:
+            same, adjacent = self.spread(pair)
+            out["same_day"] += same
+            out["adjacent_days"] += adjacent
+        out["total"] = sum(WEIGHTS[k] * v for k, v in out.items())
+        return out
+
+
+def score(problem: Problem, placements) -> Dict[str, int]:
+    state = SlotState(problem)
+    slot_of = [None] * len(problem.sessions)
+    for i, (s, placement) in enumerate(zip(problem.sessions, placements)):
+        if placement is not None:
+            slot, room = placement
+            state.place(s, ((1 << s.length) - 1) << slot, 1 << (slot // problem.periods), room)
+            slot_of[i] = slot
+    return Scorer(problem, state, slot_of).breakdown()
+
+
+def optimize(problem: Problem, solution: Solution, seed: int = 42, sweeps: int = 100,
+             time_limit_ms: Optional[int] = None) -> Tuple[Solution, dict]:
+    """Simulated annealing over a feasible (possibly partial) assignment.
+
+    Neighbourhoods: move one session to another legal start, or swap the starts
+    of two same-length sessions of a division. Every candidate keeps all hard
+    constraints; its delta is scored on the touched terms only. The cooling
+    schedule runs over ``sweeps * placed sessions`` iterations, so a run is
+    reproducible for a given seed unless the time limit cuts it short.
+    """
+    started = time.monotonic()
+    deadline = started + time_limit_ms / 1000 if time_limit_ms else None
+    rng = random.Random(seed)
+    sessions = problem.sessions
+    twice = set(problem.twice_allowed)
+    starts = {n: problem.starts(n) for n in {s.length for s in sessions}}
+    span = {n: {slot: (mask, day_bit) for slot, mask, day_bit in starts[n]} for n in starts}
+
+    placements = list(solution.placements)
+    state = SlotState(problem)
+    slot_of: List[Optional[int]] = [None] * len(sessions)
+    for i, placement in enumerate(placements):
+        if placement is not None:
+            slot, room = placement
+            state.place(sessions[i], *span[sessions[i].length][slot], room)
+            slot_of[i] = slot
+    scorer = Scorer(problem, state, slot_of)
+    before = scorer.breakdown()
+    placed = [i for i, p in enumerate(placements) if p is not None]
+    stats = {"seed": seed, "before": before, "after": before, "iterations": 0, "accepted": 0}
+    if not placed:
+        return solution, stats
+    swap_with = defaultdict(list)
+    for i in placed:
+        swap_with[(sessions[i].division, sessions[i].length)].append(i)
+
+    def lift(i):
+        s = sessions[i]
+        slot, room = placements[i]
+        state.undo(s, *span[s.length][slot], room)
+        slot_of[i] = None
+        placements[i] = None
+        return slot, room
+
+    def put(i, slot, room):
+        s = sessions[i]
+        state.place(s, *span[s.length][slot], room)
+        slot_of[i] = slot
+        placements[i] = (slot, room)
+
+    def try_put(i, slot) -> bool:
+        s = sessions[i]
+        mask, day_bit = span[s.length][slot]
+        if not state.fits(s, mask):
+            return False
+        if s.pair not in twice and state.pair_days[s.pair] & day_bit:
+            return False
+        room = pick_room(problem, state, s, mask)
+        if room is None:
+            return False
+        put(i, slot, room)
+        return True
+
+    total = before["total"]
+    best, best_total = list(placements), total
+    iterations = sweeps * len(placed)
+    t_start, t_end = 2.0, 0.05
+    for it in range(iterations):
+        if deadline is not None and it % 256 == 0 and time.monotonic() > deadline:
+            break
+        stats["iterations"] = it + 1
+        temperature = t_start * (t_end / t_start) ** (it / iterations)
+        i = placed[rng.randrange(len(placed))]
+        s = sessions[i]
+        partners = swap_with[(s.division, s.length)]
+        j = partners[rng.randrange(len(partners))] if rng.random() < 0.5 else None
+        if j is not None and (j == i or slot_of[j] == slot_of[i]):
+            continue
+        if j is None:
+            target = starts[s.length][rng.randrange(len(starts[s.length]))][0]
+            if target == slot_of[i]:
+                continue
+            terms = scorer.terms([i], [slot_of[i], target])
+            old = scorer.local(*terms)
+            slot_i, room_i = lift(i)
+            if not try_put(i, target):
+                put(i, slot_i, room_i)
+                continue
+            undo = [(i, slot_i, room_i)]
+        else:
+            terms = scorer.terms([i, j], [slot_of[i], slot_of[j]])
+            old = scorer.local(*terms)
+            slot_i, room_i = lift(i)
+            slot_j, room_j = lift(j)
+            if not try_put(i, slot_j):
+                put(i, slot_i, room_i)
+                put(j, slot_j, room_j)
+                continue
+            if not try_put(j, slot_i):
+                lift(i)
+                put(i, slot_i, room_i)
+                put(j, slot_j, room_j)
+                continue
+            undo = [(i, slot_i, room_i), (j, slot_j, room_j)]
+        delta = scorer.local(*terms) - old
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            total += delta
+            stats["accepted"] += 1
+            if total < best_total:
+                best, best_total = list(placements), total
+        else:
+            for k, _, _ in undo:
+                lift(k)
+            for k, slot, room in undo:
+                put(k, slot, room)
+
+    stats["after"] = score(problem, best)
+    stats["elapsed_ms"] = int((time.monotonic() - started) * 1000)
+    return replace(solution, placements=best), stats
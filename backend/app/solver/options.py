@@ -0,0 +1,75 @@
+import os
+from typing import Optional
+from .occupancy import SCOPES
+from .engine import SOLVERS, STRATEGIES
+from .trace import PROFILE_DIR
+
+# hard ceiling for a single solve; requests may ask for less, never more
+DEFAULT_TIME_LIMIT_MS = int(float(os.getenv("CSP_TIME_LIMIT_SECONDS", "300")) * 1000)
+# post-solve optimizer: annealing sweeps over the placed sessions, and its default budget
+OPTIMIZER_SWEEPS = int(os.getenv("OPTIMIZER_MAX_ITERATIONS", "100"))
+OPTIMIZER_TIME_LIMIT_MS = 10000
+RANDOM_SEED = int(os.getenv("RANDOM_SEED", "42"))
+
+
+def _positive_int(options: dict, key: str):
+    value = options.get(key)
+    if value in (None, ""):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be an integer")
+    if value <= 0:
+        raise ValueError(f"{key} must be positive")
+    return value
+
+
+def _seed(options: dict) -> Optional[int]:
+    value = options.get("seed")
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError("seed must be an integer")
+
+
+def parse_options(options: dict) -> dict:
+    # TimetableIn.options -> keyword arguments for solve() plus the stored-timetable
+    # occupancy scope to seed from, whether to run the infeasibility pre-check, whether
+    # to use the solution cache, the optimizer settings (None when off) and whether to
+    # return phase timings / write a cProfile capture; raises ValueError on bad input
+    options = options or {}
+    strategy = options.get("strategy", "backtrack")
+    if strategy in SOLVERS and strategy not in STRATEGIES:
+        raise ValueError(f"Strategy '{strategy}' is not available: install ortools to use it")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{strategy}', expected one of {list(STRATEGIES)}")
+    time_limit_ms = _positive_int(options, "time_limit_ms") or DEFAULT_TIME_LIMIT_MS
+    occupancy = options.get("occupancy", "published")
+    if occupancy not in SCOPES:
+        raise ValueError(f"Unknown occupancy scope '{occupancy}', expected one of {list(SCOPES)}")
+    seed = _seed(options)
+    profile = options.get("profile") in (True, 1, "1", "true")
+    if profile and not PROFILE_DIR:
+        raise ValueError("Profiling is disabled: set SOLVER_PROFILE_DIR on the server to enable it")
+    optimize = None
+    if options.get("optimize") in (True, 1, "1", "true"):
+        optimize = {
+            "seed": RANDOM_SEED if seed is None else seed,
+            "sweeps": _positive_int(options, "optimize_sweeps") or OPTIMIZER_SWEEPS,
+            "time_limit_ms": min(_positive_int(options, "optimize_ms") or OPTIMIZER_TIME_LIMIT_MS, DEFAULT_TIME_LIMIT_MS),
+        }
+    return {
+        "occupancy": occupancy,
+        "precheck": options.get("precheck", True) not in (False, 0, "0", "false"),
+        "cache": options.get("cache", True) not in (False, 0, "0", "false"),
+        "optimize": optimize,
+        "instrument": options.get("instrument") in (True, 1, "1", "true"),
+        "profile": profile,
+        "strategy": strategy,
+        "seed": seed,
+        "time_limit_ms": min(time_limit_ms, DEFAULT_TIME_LIMIT_MS),
+        "max_nodes": _positive_int(options, "max_nodes"),
+    }
@@ -0,0 +1,384 @@
+import time
+from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+from .. import models, schemas
+from .cache import cache_key, lookup, store
+from .loader import build_joint_problem, build_problem
+from .optimize import optimize
+from .occupancy import OccupancyIndex, invalidate_occupancy, load_occupancy
+from .options import parse_options
+from .precheck import InfeasibleInput, check, summary
+from .problem import Problem, Solution
+from .repair import match_entries
+from .engine import solve
+from .trace import STATS, Trace, profiled
+
+
+class GenerationCancelled(Exception):
+    pass
+
+
+def _persist(db: Session, problem: Problem, solution: Solution, name: str, department_id,
+             modes: Dict[int, object]) -> Tuple[Dict[int, int], int]:
+    # one timetable per division plus all entries, as Core executemany inserts inside the
+    # caller's transaction, and the fixed rooms the load picked; returns ({division id:
+    # timetable id}, entry rows written). A solve that placed nothing writes no (empty) timetables
+    if solution.placements and all(p is None for p in solution.placements):
+        return {}, 0
+    _save_fixed_rooms(db, problem)
+    T, E = models.Timetable, models.TimetableEntry
+    division_rows = db.execute(
+        select(models.Division.id, models.Division.name, models.Division.class_id).where(models.Division.id.in_(problem.division_ids))
+    ).all()
+    divisions = {row.id: row for row in division_rows}
+    now = datetime.utcnow()
+    headers = []
+    for div_id in problem.division_ids:
+        d = divisions[div_id]
+        headers.append({
+            "name": f"{name} - {d.name}",
+            "class_id": d.class_id,
+            "department_id": department_id,
+            "mode": models.ModeType(getattr(modes[d.class_id], "value", modes[d.class_id])),
+            "published": False,
+            "created_at": now,
+        })
+    if not headers:
+        return {}, 0
+    if db.get_bind().dialect.insert_executemany_returning:
+        ids = db.execute(insert(T).returning(T.id, sort_by_parameter_order=True), headers).scalars().all()
+    else:
+        # e.g. MySQL: no RETURNING, one short insert per division header
+        ids = [db.execute(insert(T).values(**row)).inserted_primary_key[0] for row in headers]
+    tt_by_div = dict(zip(problem.division_ids, ids))
+    rows = _entry_rows(problem, solution, tt_by_div)
+    if rows:
+        db.execute(insert(E), rows)
+    return tt_by_div, len(rows)
+
+
+def _save_fixed_rooms(db: Session, problem: Problem):
+    # unless another run saved one for the class in the meantime
+    C = models.ClassGroup
+    for class_id, room_id in problem.fixed_rooms.items():
+        db.execute(update(C).where(C.id == class_id, C.fixed_room_id.is_(None)).values(fixed_room_id=room_id))
+
+
+def _entry_rows(problem: Problem, solution: Solution, tt_by_div: Dict[int, int]) -> List[dict]:
+    # timetable_entries rows for every placed session, one per period it spans (and per batch
+    # of a rotation group)
+    rows = []
+    for s, placement in zip(problem.sessions, solution.placements):
+        if placement is None:
+            continue
+        start, room = placement
+        day, period = problem.day_period(start)
+        div_id = problem.division_ids[s.division]
+        if s.batches:
+            parts = [(n, subject, t, r) for (n, subject, t, _), r in zip(s.batches, room)]
+        else:
+            parts = [(None, s.subject, s.teacher, room)]
+        for batch_number, subject_id, t, r in parts:
+            for offset in range(s.length):
+                rows.append({
+                    "timetable_id": tt_by_div[div_id],
+                    "day_index": day,
+                    "period_index": period + offset,
+                    "division_id": div_id,
+                    "batch_number": batch_number,
+                    "subject_id": subject_id,
+                    "teacher_id": problem.teacher_ids[t],
+                    "room_id": problem.room_ids[r] if r is not None else None,
+                })
+    return rows
+
+
+def _optimize(problem: Problem, solution: Solution, settings: Optional[dict]) -> Tuple[Solution, Optional[dict]]:
+    # soft-constraint pass over the solved assignment, when the options asked for one
+    if settings is None:
+        return solution, None
+    return optimize(problem, solution, **settings)
+
+
+def _cache_key(problem: Problem, solver_kwargs: dict, settings: Optional[dict]) -> str:
+    # limits are left out: only complete solutions are cached, however long they took
+    return cache_key(problem, strategy=solver_kwargs["strategy"], seed=solver_kwargs["seed"], optimize=settings)
+
+
+def _summary(problem: Problem, solution: Solution, tt_by_div, entries: int, optimized: Optional[dict] = None,
+             cached: bool = False, trace: Optional[Trace] = None, profile: Optional[str] = None) -> dict:
+    if solution.complete:
+        message = "Generated per-division"
+    elif tt_by_div:
+        message = "Generated per-division (partial)"
+    else:
+        message = "No session could be placed; nothing was saved"
+    out = {
+        "success": solution.complete,
+        "ids": list(tt_by_div.values()),
+        "message": message,
+        "entries": entries,
+        "sessions": len(problem.sessions),
+        "complete": solution.complete,
+        "stopped": solution.stopped,
+        "nodes": solution.nodes,
+        "unplaced": solution.unplaced_report(problem),
+        "cached": cached,
+    }
+    if optimized is not None:
+        out["optimization"] = optimized
+    if trace is not None:
+        out["instrumentation"] = trace.as_dict()
+    if profile:
+        out["profile"] = profile
+    return out
+
+
+def generate_timetables(db: Session, payload: schemas.TimetableIn,
+                        on_progress: Optional[Callable[[int, int, int, int], bool]] = None) -> dict:
+    # Full generate run: load, solve, persist. Raises ValueError on bad options.
+    # on_progress(placed, total, nodes, elapsed_ms) is polled during search; False cancels.
+    solver_kwargs = parse_options(payload.options)
+    scope = solver_kwargs.pop("occupancy")
+    settings = solver_kwargs.pop("optimize")
+    precheck = solver_kwargs.pop("precheck")
+    use_cache = solver_kwargs.pop("cache")
+    instrument = solver_kwargs.pop("instrument")
+    trace = Trace()
+    with profiled("generate", solver_kwargs.pop("profile")) as capture:
+        # Load context into a pure-data problem (bitmask solver works on indexes)
+        problem = build_problem(db, payload.class_id, payload.department_id, payload.mode, trace)
+        # slots other classes' stored timetables already hold for our teachers and rooms
+        load_occupancy(db, payload.department_id, scope).seed(problem, exclude_class_ids=[payload.class_id])
+        trace.lap("occupancy")
+        if precheck:
+            issues = check(problem)
+            trace.lap("precheck")
+            if issues:
+                raise InfeasibleInput(issues)
+
+        # unchanged input replays the stored assignment instead of solving again
+        key = _cache_key(problem, solver_kwargs, settings) if use_cache else None
+        hit = lookup(db, key) if key else None
+        trace.lap("cache")
+        if hit:
+            solution, optimized = hit
+        else:
+            # Hard constraint CSP, global across divisions to avoid teacher conflicts
+            total = len(problem.sessions)
+
+            def progress(budget):
+                return on_progress(budget.placed, total, budget.nodes, budget.elapsed_ms)
+            solution = solve(problem, on_progress=progress if on_progress is not None else None, **solver_kwargs)
+            trace.solved(solution)
+            if solution.stopped == "cancelled":
+                db.rollback()
+                raise GenerationCancelled()
+            solution, optimized = _optimize(problem, solution, settings)
+            if optimized is not None:
+                trace.lap("optimize")
+
+        # nothing is written until the solve is over, so a failed run leaves no empty timetables
+        try:
+            if key and not hit:
+                store(db, key, solution, optimized)
+            tt_by_div, entries = _persist(db, problem, solution, payload.name, payload.department_id, {payload.class_id: payload.mode})
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        trace.lap("persist")
+    invalidate_occupancy(payload.department_id)
+    STATS.record("generate", trace)
+    return _summary(problem, solution, tt_by_div, entries, optimized, cached=hit is not None,
+                    trace=trace if instrument else None, profile=capture["path"])
+
+
+def _solve_until(deadline: float, problem: Problem, **solver_kwargs) -> Solution:
+    # solve() with the time left until `deadline`, a time.time() stamp: the pool's worker
+    # processes share that clock. At least 1 ms, as no limit at all would be 0
+    time_limit_ms = max(1, int((deadline - time.time()) * 1000))
+    return solve(problem, time_limit_ms=time_limit_ms, **solver_kwargs)
+
+
+def generate_department(db: Session, payload: schemas.DepartmentGenerateIn, executor=None) -> dict:
+    # Regenerate every class of a department in one go. Sessions are split into independent
+    # components (no shared teacher, division or room); each component is solved on its own,
+    # in parallel when an executor is given, and everything is written in one transaction.
+    solver_kwargs = parse_options(payload.options)
+    scope = solver_kwargs.pop("occupancy")
+    settings = solver_kwargs.pop("optimize")
+    precheck = solver_kwargs.pop("precheck")
+    use_cache = solver_kwargs.pop("cache")
+    instrument = solver_kwargs.pop("instrument")
+    trace = Trace()
+    with profiled("department", solver_kwargs.pop("profile")) as capture:
+        q = db.query(models.ClassGroup).filter(models.ClassGroup.department_id == payload.department_id)
+        if payload.class_ids:
+            q = q.filter(models.ClassGroup.id.in_(payload.class_ids))
+        classes = q.order_by(models.ClassGroup.id).all()
+        if not classes:
+            raise ValueError("No classes to generate for this department")
+        problem = build_joint_problem(db, [(c.id, payload.department_id, c.mode) for c in classes], trace)
+        load_occupancy(db, payload.department_id, scope).seed(problem, exclude_class_ids=[c.id for c in classes])
+        trace.lap("occupancy")
+        if precheck:
+            issues = check(problem)
+            trace.lap("precheck")
+            if issues:
+                raise InfeasibleInput(issues)
+
+        components = problem.components()
+        key = _cache_key(problem, solver_kwargs, settings) if use_cache else None
+        hit = lookup(db, key) if key else None
+        trace.lap("cache")
+        if hit:
+            solution, optimized = hit
+        else:
+            subproblems = [problem.subproblem(indexes) for indexes in components]
+            # one deadline for every component: one that waited in the pool's queue (behind other
+            # components or jobs) only gets what is left, so the request stays within its limit
+            deadline = time.time() + solver_kwargs.pop("time_limit_ms") / 1000.0
+            run = partial(_solve_until, deadline, **solver_kwargs)
+            if executor is not None and len(subproblems) > 1:
+                parts = list(executor.map(run, subproblems))
+            else:
+                parts = [run(sub) for sub in subproblems]
+            solution = Solution.merge(len(problem.sessions), list(zip(components, parts)))
+            trace.solved(solution)
+            solution, optimized = _optimize(problem, solution, settings)
+            if optimized is not None:
+                trace.lap("optimize")
+
+        try:
+            if key and not hit:
+                store(db, key, solution, optimized)
+            tt_by_div, entries = _persist(db, problem, solution, payload.name, payload.department_id, {c.id: c.mode for c in classes})
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        trace.lap("persist")
+    invalidate_occupancy(payload.department_id)
+    STATS.record("department", trace)
+    out = _summary(problem, solution, tt_by_div, entries, optimized, cached=hit is not None,
+                   trace=trace if instrument else None, profile=capture["path"])
+    out["components"] = len(components)
+    out["class_ids"] = [c.id for c in classes]
+    return out
+
+
+def validate_timetable(db: Session, payload: schemas.ValidateIn) -> dict:
+    # the pre-check on its own: load the class as generate would and report what cannot fit
+    started = time.perf_counter()
+    options = parse_options(payload.options)
+    mode = payload.mode
+    if mode is None:
+        cls = db.query(models.ClassGroup).get(payload.class_id)
+        if not cls:
+            raise ValueError("Class not found")
+        mode = cls.mode
+    problem = build_problem(db, payload.class_id, payload.department_id, mode)
+    load_occupancy(db, payload.department_id, options["occupancy"]).seed(problem, exclude_class_ids=[payload.class_id])
+    out = summary(problem, check(problem))
+    out["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return out
+
+
+ENTRY_KEY = ("division_id", "day_index", "period_index", "subject_id", "teacher_id", "room_id", "batch_number")
+
+
+def repair_timetable(db: Session, tt: models.Timetable, options: Optional[dict] = None) -> dict:
+    # Re-solve only what a data change broke in a stored timetable: entries that still fit
+    # (same teacher, hours, grid, free room) stay pinned, the rest of its sessions are solved
+    # around them, and only the differing entry rows are deleted / inserted.
+    solver_kwargs = parse_options(options)
+    scope = solver_kwargs.pop("occupancy")
+    solver_kwargs.pop("optimize")  # moving pinned entries would defeat a minimal diff
+    solver_kwargs.pop("precheck")  # a partial repair still beats none
+    solver_kwargs.pop("cache")  # each repair starts from different stored entries
+    instrument = solver_kwargs.pop("instrument")
+    trace = Trace()
+    E, T = models.TimetableEntry, models.Timetable
+    with profiled("repair", solver_kwargs.pop("profile")) as capture:
+        stored = db.execute(
+            select(E.id, *(getattr(E, k) for k in ENTRY_KEY)).where(E.timetable_id == tt.id)
+        ).all()
+        division_ids = sorted({row.division_id for row in stored})
+        if not division_ids:
+            raise ValueError("Timetable has no entries to repair; generate it instead")
+
+        full = build_problem(db, tt.class_id, tt.department_id, tt.mode, trace)
+        problem = full.subproblem([i for i, s in enumerate(full.sessions) if full.division_ids[s.division] in division_ids])
+        load_occupancy(db, tt.department_id, scope).seed(problem, exclude_class_ids=[tt.class_id])
+        if scope != "none":
+            # the class's other divisions are held by their own timetables
+            siblings = OccupancyIndex()
+            q = select(E.teacher_id, E.room_id, E.day_index, E.period_index).join(T, T.id == E.timetable_id).where(
+                T.class_id == tt.class_id, T.id != tt.id, E.division_id.notin_(division_ids))
+            if scope == "published":
+                q = q.where(T.published.is_(True))
+            for teacher_id, room_id, day, period in db.execute(q):
+                siblings.add(tt.class_id, teacher_id, room_id, day, period)
+            siblings.seed(problem)
+        trace.lap("occupancy")
+
+        pinned = match_entries(problem, [(row.division_id, row.subject_id, row.teacher_id, row.room_id,
+                                          row.day_index, row.period_index, row.batch_number) for row in stored])
+        rest, free = problem.pin(pinned)
+        trace.lap("match")
+        solution = Solution.merge(len(problem.sessions), [(free, solve(rest, **solver_kwargs))])
+        trace.solved(solution)
+        for i, placement in enumerate(pinned):
+            if placement is not None:
+                solution.placements[i] = placement
+
+        # minimal diff: rows present on both sides are left alone
+        old: Dict[tuple, List[int]] = {}
+        for row in stored:
+            old.setdefault(tuple(getattr(row, k) for k in ENTRY_KEY), []).append(row.id)
+        added = []
+        for row in _entry_rows(problem, solution, {d: tt.id for d in problem.division_ids}):
+            ids = old.get(tuple(row[k] for k in ENTRY_KEY))
+            if ids:
+                ids.pop()
+            else:
+                added.append(row)
+        leftover = {i for ids in old.values() for i in ids}
+        removed = [row for row in stored if row.id in leftover]
+        try:
+            if removed:
+                db.execute(delete(E).where(E.id.in_([row.id for row in removed])))
+            if added:
+                db.execute(insert(E), added)
+            if removed or added:
+                tt.grid_version = (tt.grid_version or 0) + 1
+            _save_fixed_rooms(db, problem)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        trace.lap("persist")
+    invalidate_occupancy(tt.department_id)
+    STATS.record("repair", trace)
+    out = {
+        "success": solution.complete,
+        "id": tt.id,
+        "complete": solution.complete,
+        "stopped": solution.stopped,
+        "nodes": solution.nodes,
+        "sessions": len(problem.sessions),
+        "resolved": len(free),
+        "kept": len(stored) - len(removed),
+        "added": [{k: row[k] for k in ENTRY_KEY} for row in added],
+        "removed": [{"id": row.id, **{k: getattr(row, k) for k in ENTRY_KEY}} for row in removed],
+        "unplaced": solution.unplaced_report(problem),
+    }
+    if instrument:
+        out["instrumentation"] = trace.as_dict()
+    if capture["path"]:
+        out["profile"] = capture["path"]
+    return out
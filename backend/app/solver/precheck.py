@@ -0,0 +1,162 @@
+from collections import defaultdict
+from itertools import combinations
+from typing import Dict, List
+from .problem import Problem
+from .state import SlotState, pick_room
+
+# above this many room pools only single pools and pools sharing a room are combined
+MAX_POOL_SUBSETS = 10
+
+
+class InfeasibleInput(ValueError):
+    """Raised when the pre-check proves a problem has no complete timetable."""
+
+    def __init__(self, issues: List[dict]):
+        super().__init__(f"Timetable cannot be completed: {issues[0]['message']}" + (
+            f" (and {len(issues) - 1} more issues)" if len(issues) > 1 else ""))
+        self.issues = issues
+
+
+def _windows(free: int, problem: Problem, length: int) -> int:
+    # disjoint `length`-period windows inside the free periods of each day
+    total = 0
+    for day in range(problem.days):
+        run = 0
+        for period in range(problem.periods):
+            if free >> problem.slot(day, period) & 1:
+                run += 1
+            else:
+                total += run // length
+                run = 0
+        total += run // length
+    return total
+
+
+def check(problem: Problem) -> List[dict]:
+    """Counting and Hall-style bounds that no complete timetable can violate.
+
+    Every issue is a lower bound on demand (periods, days, windows) that beats
+    what the grid, the blocked slots or the rooms can supply; an empty list
+    does not prove the problem feasible.
+    """
+    sessions = problem.sessions
+    state = SlotState(problem)
+    full = (1 << problem.slots) - 1
+    issues: List[dict] = []
+    division_free = [~m & full for m in state.division]
+    teacher_free = [~m & full for m in state.teacher]
+    room_free = [~m & full for m in state.room]
+    by_division, by_teacher, by_pair, by_pool = defaultdict(list), defaultdict(list), defaultdict(list), defaultdict(list)
+    for i, s in enumerate(sessions):
+        by_division[s.division].append(i)
+        by_pair[s.pair].append(i)
+        # a rotation group counts once per batch: each batch holds a teacher and a room
+        for t in s.teachers:
+            by_teacher[t].append(i)
+        for p in s.pools:
+            by_pool[p].append(i)
+
+    for d, members in by_division.items():
+        needed = sum(sessions[i].length for i in members)
+        available = division_free[d].bit_count()
+        if needed > available:
+            issues.append({"kind": "division_overload", "division_id": problem.division_ids[d], "needed": needed,
+                           "available": available,
+                           "message": f"Division {problem.division_ids[d]} needs {needed} periods but has {available} free"})
+        for length in sorted({sessions[i].length for i in members if sessions[i].length > 1}):
+            count = sum(1 for i in members if sessions[i].length == length)
+            windows = _windows(division_free[d], problem, length)
+            if count > windows:
+                issues.append({"kind": "lab_windows", "division_id": problem.division_ids[d], "length": length,
+                               "needed": count, "available": windows,
+                               "message": f"Division {problem.division_ids[d]} needs {count} blocks of {length} "
+                                          f"consecutive periods but only {windows} fit between breaks"})
+
+    for t, members in by_teacher.items():
+        teacher_id = problem.teacher_ids[t]
+        # a teacher can only teach when one of their divisions is free too
+        reachable = 0
+        for d in {sessions[i].division for i in members}:
+            reachable |= division_free[d]
+        needed = sum(sessions[i].length for i in members)
+        available = (teacher_free[t] & reachable).bit_count()
+        if needed > available:
+            issues.append({"kind": "teacher_overload", "teacher_id": teacher_id, "needed": needed, "available": available,
+                           "message": f"Teacher {teacher_id} is assigned {needed} periods but only {available} are usable"})
+        # Hall bound per (teacher, division): those sessions only fit where both are free
+        for d in {sessions[i].division for i in members}:
+            subset = [i for i in members if sessions[i].division == d]
+            needed = sum(sessions[i].length for i in subset)
+            available = (teacher_free[t] & division_free[d]).bit_count()
+            if needed > available:
+                issues.append({"kind": "teacher_division_overload", "teacher_id": teacher_id,
+                               "division_id": problem.division_ids[d], "needed": needed, "available": available,
+                               "message": f"Teacher {teacher_id} owes division {problem.division_ids[d]} {needed} "
+                                          f"periods but they share only {available} free periods"})
+
+    twice = set(problem.twice_allowed)
+    starts = {n: problem.starts(n) for n in {s.length for s in sessions}}
+    for pair, members in by_pair.items():
+        s = sessions[members[0]]
+        legal = [(slot, mask) for slot, mask, _ in starts[s.length]
+                 if state.fits(s, mask) and pick_room(problem, state, s, mask) is not None]
+        base = {"division_id": problem.division_ids[s.division], "subject_id": s.subject,
+                "teacher_id": problem.teacher_ids[s.teacher]}
+        if not legal:
+            issues.append({"kind": "no_start", **base, "needed": len(members), "available": 0,
+                           "message": f"Subject {base['subject_id']} of division {base['division_id']} has no slot where "
+                                      f"division, teacher and a suitable room are all free"})
+            continue
+        if pair not in twice:
+            days = len({slot // problem.periods for slot, _ in legal})
+            if len(members) > days:
+                issues.append({"kind": "pair_days", **base, "needed": len(members), "available": days,
+                               "message": f"Subject {base['subject_id']} of division {base['division_id']} needs "
+                                          f"{len(members)} separate days but can only be taught on {days}"})
+
+    # Hall bound over room pools: sessions whose rooms all lie in a set of rooms need that many room-periods
+    pools = sorted(by_pool)
+    groups = [[p] for p in pools]
+    if len(pools) <= MAX_POOL_SUBSETS:
+        groups += [list(c) for n in range(2, len(pools) + 1) for c in combinations(pools, n)]
+    else:
+        groups += [[p, q] for p, q in combinations(pools, 2) if set(problem.pools[p]) & set(problem.pools[q])]
+    seen = set()
+    for group in groups:
+        rooms = frozenset(r for p in group for r in problem.pools[p])
+        if rooms in seen:
+            continue
+        seen.add(rooms)
+        members = [i for p in pools if set(problem.pools[p]) <= rooms for i in by_pool[p]]
+        # rooms only count while one of these sessions' divisions can be taught
+        usable = 0
+        for d in {sessions[i].division for i in members}:
+            usable |= division_free[d]
+        needed = sum(sessions[i].length for i in members)
+        available = sum((room_free[r] & usable).bit_count() for r in rooms)
+        lengths = {sessions[i].length for i in members}
+        kinds = sorted({sessions[i].kind for i in members})
+        room_ids = sorted(problem.room_ids[r] for r in rooms)
+        if needed > available:
+            issues.append({"kind": "room_capacity", "room_ids": room_ids, "session_kinds": kinds, "needed": needed,
+                           "available": available,
+                           "message": f"{', '.join(kinds)} sessions need {needed} room periods but rooms "
+                                      f"{room_ids} have {available} free"})
+            continue
+        for length in sorted(n for n in lengths if n > 1):
+            count = sum(1 for i in members if sessions[i].length == length)
+            windows = sum(_windows(room_free[r] & usable, problem, length) for r in rooms)
+            if count > windows:
+                issues.append({"kind": "room_windows", "room_ids": room_ids, "length": length, "needed": count,
+                               "available": windows,
+                               "message": f"{count} sessions of {length} periods need rooms {room_ids} but only "
+                                          f"{windows} such blocks are free"})
+    return issues
+
+
+def summary(problem: Problem, issues: List[dict]) -> Dict:
+    return {
+        "feasible": not issues,
+        "sessions": len(problem.sessions),
+        "issues": issues,
+    }
@@ -0,0 +1,221 @@
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+
+LECTURE = "lecture"
+LAB = "lab"
+TUTORIAL = "tutorial"
+
+# schedule LAB first, then TUTORIAL, then LECTURE
+PRIORITY = {LAB: 0, TUTORIAL: 1, LECTURE: 2}
+
+
+@dataclass
+class Session:
+    # one weekly session to place; division/teacher are indexes into Problem lists
+    division: int
+    subject: int  # subject id
+    teacher: int
+    kind: str  # lecture / lab / tutorial
+    length: int = 1  # consecutive periods
+    pair: int = 0  # index of the (division, subject) pair, for the once-per-day rule
+    pool: int = 0  # index into Problem.pools: the rooms this session may use
+    # rotation group: (batch number, subject id, teacher, pool) of every batch taking a lab in
+    # parallel; placed as one unit, each batch in its own room. subject/teacher/pool mirror the first
+    batches: Tuple[Tuple[int, int, int, int], ...] = ()
+
+    @property
+    def teachers(self) -> Tuple[int, ...]:
+        return tuple(b[2] for b in self.batches) if self.batches else (self.teacher,)
+
+    @property
+    def pools(self) -> Tuple[int, ...]:
+        return tuple(b[3] for b in self.batches) if self.batches else (self.pool,)
+
+
+def placed_rooms(room) -> Tuple[int, ...]:
+    # a placement's room is None, one room index, or a tuple with one room per batch of a rotation group
+    if room is None:
+        return ()
+    return room if isinstance(room, tuple) else (room,)
+
+
+def move_days(mask: int, order: List[int], width: int) -> int:
+    # move each day's `width` bits of `mask` from day d to day order[d]
+    day_bits = (1 << width) - 1
+    out = 0
+    for day, to in enumerate(order):
+        out |= ((mask >> (day * width)) & day_bits) << (to * width)
+    return out
+
+
+@dataclass
+class Problem:
+    # pure-data description of one generate run, independent of the ORM
+    days: int
+    periods: int
+    sessions: List[Session]
+    division_ids: List[int]
+    teacher_ids: List[int]
+    room_ids: List[int]
+    pools: List[List[int]] = field(default_factory=list)  # room indexes in preference order
+    division_blocked: List[int] = field(default_factory=list)  # per-division slots never usable (breaks, days off)
+    teacher_blocked: List[int] = field(default_factory=list)  # per-teacher slots taken by other stored timetables
+    room_blocked: List[int] = field(default_factory=list)  # per-room slots taken by other stored timetables
+    teacher_unavailable: List[int] = field(default_factory=list)  # per-teacher slots they can never teach
+    teacher_disliked: List[int] = field(default_factory=list)  # per-teacher slots they would rather not teach
+    twice_allowed: List[int] = field(default_factory=list)  # pair indexes allowed twice in a day
+    pairs: List[Tuple[int, int]] = field(default_factory=list)  # pair index -> (division id, subject id)
+    pair_days: List[int] = field(default_factory=list)  # per-pair days already used by pinned sessions
+    fixed_rooms: Dict[int, int] = field(default_factory=dict)  # class id -> fixed room picked by the load, not yet saved
+
+    @property
+    def slots(self) -> int:
+        return self.days * self.periods
+
+    def slot(self, day: int, period: int) -> int:
+        return day * self.periods + period
+
+    def day_period(self, slot: int) -> Tuple[int, int]:
+        return divmod(slot, self.periods)
+
+    def starts(self, length: int) -> List[Tuple[int, int, int]]:
+        # (slot, slot mask, day bit) start positions for a session of `length` periods that
+        # stays within one day; per-division blocked slots are enforced by SlotState
+        out = []
+        for day in range(self.days):
+            for period in range(self.periods - length + 1):
+                s = self.slot(day, period)
+                out.append((s, ((1 << length) - 1) << s, 1 << day))
+        return out
+
+    def twins(self) -> List[Optional[int]]:
+        # previous interchangeable session (same pair, kind, length, rooms and batches) for each
+        # session, else None; placing twins in increasing slot order removes their N! equivalent permutations
+        last: Dict[tuple, int] = {}
+        out: List[Optional[int]] = []
+        for i, s in enumerate(self.sessions):
+            key = (s.pair, s.kind, s.length, s.pool, s.batches)
+            out.append(last.get(key))
+            last[key] = i
+        return out
+
+    def components(self) -> List[List[int]]:
+        # groups of session indexes that share no teacher, division or room with each other
+        parent = list(range(len(self.sessions)))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        owner: Dict[Tuple[str, int], int] = {}
+        for i, s in enumerate(self.sessions):
+            keys = [("t", t) for t in s.teachers] + [("d", s.division)]
+            keys += [("r", r) for p in s.pools for r in self.pools[p]]
+            for key in keys:
+                if key in owner:
+                    parent[find(i)] = find(owner[key])
+                else:
+                    owner[key] = i
+        groups: Dict[int, List[int]] = {}
+        for i in range(len(self.sessions)):
+            groups.setdefault(find(i), []).append(i)
+        return list(groups.values())
+
+    def subproblem(self, indexes: List[int]) -> "Problem":
+        # same index spaces, only the given sessions
+        return replace(self, sessions=[self.sessions[i] for i in indexes])
+
+    def relabel_days(self, order: List[int]) -> "Problem":
+        # the same problem with day d renamed order[d]; hard constraints do not tell days apart,
+        # so a solution maps back one to one (see Solution.relabel_days)
+        def move(masks):
+            return [move_days(m, order, self.periods) for m in masks]
+        return replace(self, division_blocked=move(self.division_blocked), teacher_blocked=move(self.teacher_blocked),
+                       room_blocked=move(self.room_blocked), teacher_unavailable=move(self.teacher_unavailable),
+                       teacher_disliked=move(self.teacher_disliked),
+                       pair_days=[move_days(m, order, 1) for m in self.pair_days])
+
+    def pin(self, placements: List[Optional[Tuple[int, Optional[int]]]]) -> Tuple["Problem", List[int]]:
+        # fold the placed sessions into blocked slots (and used days of their pair); returns the
+        # problem over the sessions still to place, plus their indexes in this problem
+        teacher = list(self.teacher_blocked) or [0] * len(self.teacher_ids)
+        room = list(self.room_blocked) or [0] * len(self.room_ids)
+        division = list(self.division_blocked) or [0] * len(self.division_ids)
+        pair_days = list(self.pair_days) or [0] * len(self.pairs)
+        free = []
+        for i, (s, placement) in enumerate(zip(self.sessions, placements)):
+            if placement is None:
+                free.append(i)
+                continue
+            slot, taken = placement
+            mask = ((1 << s.length) - 1) << slot
+            for t in s.teachers:
+                teacher[t] |= mask
+            division[s.division] |= mask
+            for r in placed_rooms(taken):
+                room[r] |= mask
+            pair_days[s.pair] |= 1 << (slot // self.periods)
+        pinned = replace(self, sessions=[self.sessions[i] for i in free], teacher_blocked=teacher,
+                         room_blocked=room, division_blocked=division, pair_days=pair_days)
+        return pinned, free
+
+
+@dataclass
+class Solution:
+    # placements[i] is (start slot, room index or None) for session i, or None when unplaced;
+    # a rotation group's room is a tuple with one room index per batch
+    placements: List[Optional[Tuple[int, Optional[int]]]]
+    complete: bool = False
+    nodes: int = 0  # placements tried by the search
+    stopped: Optional[str] = None  # "time_limit" / "node_limit" / "cancelled" when cut short, "infeasible" when proven so
+    reasons: Dict[int, Dict[str, int]] = field(default_factory=dict)  # unplaced session -> blocked start counts
+    stats: Dict[str, int] = field(default_factory=dict)  # search counters: backtracks, rejected starts by reason, ...
+    fill_ms: float = 0.0  # time spent in the relaxed fill after an incomplete search
+
+    @property
+    def unplaced(self) -> List[int]:
+        return [i for i, p in enumerate(self.placements) if p is None]
+
+    def relabel_days(self, order: List[int], periods: int) -> "Solution":
+        # placements of a Problem.relabel_days(order) solution, on the original days
+        back = {to: day for day, to in enumerate(order)}
+        placements = [None if p is None else ((back[p[0] // periods] * periods) + p[0] % periods, p[1])
+                      for p in self.placements]
+        return replace(self, placements=placements)
+
+    @classmethod
+    def merge(cls, total: int, parts: List[Tuple[List[int], "Solution"]]) -> "Solution":
+        # stitch component solutions back into one over the full session list
+        merged = cls(placements=[None] * total, complete=True)
+        for indexes, part in parts:
+            for local, i in enumerate(indexes):
+                merged.placements[i] = part.placements[local]
+            for local, why in part.reasons.items():
+                merged.reasons[indexes[local]] = why
+            merged.nodes += part.nodes
+            merged.fill_ms += part.fill_ms
+            for name, count in part.stats.items():
+                merged.stats[name] = merged.stats.get(name, 0) + count
+            merged.complete = merged.complete and part.complete
+            merged.stopped = merged.stopped or part.stopped
+        return merged
+
+    def unplaced_report(self, problem: Problem) -> List[dict]:
+        out = []
+        for i in self.unplaced:
+            s = problem.sessions[i]
+            item = {
+                "division_id": problem.division_ids[s.division],
+                "subject_id": s.subject,
+                "teacher_id": problem.teacher_ids[s.teacher],
+                "kind": s.kind,
+                "blocked": self.reasons.get(i, {}),
+            }
+            if s.batches:
+                item["batches"] = [{"batch_number": n, "subject_id": subject, "teacher_id": problem.teacher_ids[t]}
+                                   for n, subject, t, _ in s.batches]
+            out.append(item)
+        return out
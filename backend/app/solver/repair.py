@@ -0,0 +1,90 @@
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
+from .problem import Problem
+from .state import SlotState, pick_room
+
+# a stored entry: (division id, subject id, teacher id, room id, day, period, batch number or None)
+Entry = Tuple[int, int, int, Optional[int], int, int, Optional[int]]
+
+
+def _runs(entries: Iterable[Entry]):
+    # merge entries into runs of consecutive periods with the same division, subject, teacher, room and batch
+    runs = []
+    for div_id, subject_id, teacher_id, room_id, day, period, batch in sorted(entries, key=lambda e: (e[0], e[6] or 0, e[4], e[5])):
+        last = runs[-1] if runs else None
+        if last and tuple(last[:5]) == (div_id, subject_id, teacher_id, room_id, day) and last[7] == batch \
+                and last[5] + last[6] == period:
+            last[6] += 1
+        else:
+            runs.append([div_id, subject_id, teacher_id, room_id, day, period, 1, batch])
+    return runs
+
+
+def match_entries(problem: Problem, entries: Iterable[Entry]) -> List[Optional[tuple]]:
+    """Map stored entries back onto the problem's sessions, keeping every one still valid.
+
+    A stored run is kept for a session of the same division, subject and teacher
+    when its span still fits the grid, does not clash with blocked slots or with
+    entries kept before it, and respects the once-per-day rule. Batch runs that
+    start and end together are matched as one rotation group, which needs the
+    same batches, subjects and teachers. A kept slot whose room is no longer
+    allowed gets another free room of the session's pool. Sessions left as None
+    are the ones to re-solve; stored runs matched to no session (fewer hours,
+    new teacher) are simply dropped.
+    """
+    sessions = problem.sessions
+    division_pos = {d: i for i, d in enumerate(problem.division_ids)}
+    teacher_pos = {t: i for i, t in enumerate(problem.teacher_ids)}
+    room_pos = {r: i for i, r in enumerate(problem.room_ids)}
+    twice = set(problem.twice_allowed)
+    by_key = defaultdict(list)
+    for i, s in enumerate(sessions):
+        if s.batches:
+            by_key[(s.division, frozenset((n, subject, t) for n, subject, t, _ in s.batches))].append(i)
+        else:
+            by_key[(s.division, s.subject, s.teacher)].append(i)
+
+    # plain runs as they are; batch runs clustered by their common span
+    spans = []
+    clusters = defaultdict(list)
+    for div_id, subject_id, teacher_id, room_id, day, period, run, batch in _runs(entries):
+        if div_id not in division_pos or teacher_id not in teacher_pos or day >= problem.days:
+            continue
+        d, t = division_pos[div_id], teacher_pos[teacher_id]
+        if batch is None:
+            spans.append(((d, subject_id, t), day, period, run, {None: room_id}))
+        else:
+            clusters[(d, day, period, run)].append((batch, subject_id, t, room_id))
+    for (d, day, period, run), members in clusters.items():
+        key = (d, frozenset((n, subject, t) for n, subject, t, _ in members))
+        spans.append((key, day, period, run, {n: room_id for n, _, _, room_id in members}))
+
+    state = SlotState(problem)
+    placements: List[Optional[tuple]] = [None] * len(sessions)
+    for key, day, period, run, stored_rooms in spans:
+        waiting = [i for i in by_key.get(key, []) if placements[i] is None]
+        if not waiting:
+            continue
+        # sessions of one key share a length; a run holds one session per `length` periods
+        length = sessions[waiting[0]].length
+        for start in range(period, period + run - length + 1, length):
+            if not waiting or start + length > problem.periods:
+                break
+            i = waiting[0]
+            s = sessions[i]
+            slot = problem.slot(day, start)
+            mask, day_bit = ((1 << length) - 1) << slot, 1 << day
+            if not state.fits(s, mask) or (s.pair not in twice and state.pair_days[s.pair] & day_bit):
+                continue
+            wanted = [room_pos.get(stored_rooms[b[0]]) for b in s.batches] if s.batches else [room_pos.get(stored_rooms[None])]
+            if all(r is not None and r in problem.pools[p] and state.room_free(r, mask) for r, p in zip(wanted, s.pools)) \
+                    and len(set(wanted)) == len(wanted):
+                room = tuple(wanted) if s.batches else wanted[0]
+            else:
+                room = pick_room(problem, state, s, mask)
+                if room is None:
+                    continue
+            state.place(s, mask, day_bit, room)
+            placements[i] = (slot, room)
+            waiting.pop(0)
+    return placements
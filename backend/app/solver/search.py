@@ -0,0 +1,193 @@
+from collections import Counter
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+from .budget import Budget
+from .mrv import search_mrv
+from .problem import PRIORITY, Problem, Solution
+from .state import SlotState, pick_room
+
+
+def _backtrack(problem: Problem, state: SlotState, order: List[int],
+               placements: List[Optional[Tuple[int, Optional[int]]]], budget: Budget,
+               symmetry: bool = True) -> Tuple[bool, list]:
+    # fixed-order chronological backtracking over row-major start slots, on an explicit
+    # stack: pos[depth] is where the value iterator of that choice point resumes.
+    # Returns (solved, deepest partial assignment seen).
+    sessions = problem.sessions
+    starts = {n: problem.starts(n) for n in {s.length for s in sessions}}
+    twice = set(problem.twice_allowed)
+    n = len(order)
+    pos = [0] * n
+    chosen: List[Optional[Tuple[int, int, Optional[int]]]] = [None] * n
+    # a twin placed earlier in the order only lets this session start after it
+    depth_of = {i: d for d, i in enumerate(order)}
+    twin_depth = [None] * n
+    if symmetry:
+        twins = problem.twins()
+        for d, i in enumerate(order):
+            prev = twins[i]
+            if prev is not None and depth_of[prev] < d:
+                twin_depth[d] = depth_of[prev]
+    best, best_depth = list(placements), 0
+    # rejected start slots by reason, kept in locals: the loop below is the hot path
+    division_busy = teacher_busy = same_day = no_room = backtracks = 0
+    exhausted = False
+
+    depth = 0
+    while 0 <= depth < n:
+        i = order[depth]
+        s = sessions[i]
+        if chosen[depth] is not None:
+            # resuming after a failure below: take back this level's placement first
+            mask, day_bit, room = chosen[depth]
+            state.undo(s, mask, day_bit, room)
+            placements[i] = None
+            chosen[depth] = None
+        strict = s.pair not in twice
+        candidates = starts[s.length]
+        k = pos[depth]
+        while k < len(candidates):
+            slot, mask, day_bit = candidates[k]
+            k += 1
+            if not state.fits(s, mask):
+                if state.division[s.division] & mask:
+                    division_busy += 1
+                else:
+                    teacher_busy += 1
+                continue
+            if strict and state.pair_days[s.pair] & day_bit:
+                same_day += 1
+                continue
+            room = pick_room(problem, state, s, mask)
+            if room is None:
+                no_room += 1
+                continue
+            state.place(s, mask, day_bit, room)
+            placements[i] = (slot, room)
+            chosen[depth] = (mask, day_bit, room)
+            break
+        if chosen[depth] is not None:
+            pos[depth] = k
+            depth += 1
+            if depth > best_depth:
+                best, best_depth = list(placements), depth
+            if not budget.spend(depth):
+                exhausted = True
+                break
+            if depth < n:
+                # candidates are in slot order, so resuming at the twin's next position
+                # skips every slot up to and including the twin's
+                twin = twin_depth[depth]
+                pos[depth] = pos[twin] if twin is not None else 0
+        else:
+            depth -= 1
+            backtracks += 1
+    budget.counters.update(backtracks=backtracks, rejected_division_busy=division_busy,
+                           rejected_teacher_busy=teacher_busy, rejected_same_day=same_day, room_pick_failed=no_room)
+    return not exhausted and depth >= n, best
+
+
+def _restore(problem: Problem, placements) -> SlotState:
+    state = SlotState(problem)
+    for s, placement in zip(problem.sessions, placements):
+        if placement is not None:
+            slot, room = placement
+            state.place(s, ((1 << s.length) - 1) << slot, 1 << (slot // problem.periods), room)
+    return state
+
+
+def _why(problem: Problem, state: SlotState, i: int, starts) -> Dict[str, int]:
+    # how many start slots each constraint rules out for an unplaced session
+    s = problem.sessions[i]
+    blocked = Counter()
+    never = problem.division_blocked[s.division] if problem.division_blocked else 0
+    away = elsewhere = busy = 0
+    for t in s.teachers:
+        away |= problem.teacher_unavailable[t] if problem.teacher_unavailable else 0
+        elsewhere |= problem.teacher_blocked[t] if problem.teacher_blocked else 0
+        busy |= state.teacher[t]
+    for slot, mask, day_bit in starts[s.length]:
+        if never & mask:
+            blocked["unavailable"] += 1
+        elif away & mask:
+            blocked["teacher_unavailable"] += 1
+        elif elsewhere & mask:
+            blocked["teacher_elsewhere"] += 1
+        elif busy & mask:
+            blocked["teacher_busy"] += 1
+        elif state.division[s.division] & mask:
+            blocked["division_busy"] += 1
+        elif pick_room(problem, state, s, mask) is None:
+            blocked["no_room"] += 1
+    if not starts[s.length]:
+        blocked["no_slot"] += 1
+    return dict(blocked)
+
+
+def finish(problem: Problem, solved: bool, best, budget: Budget) -> Solution:
+    # turn a search outcome into a Solution. Unless solved, keep the deepest strict partial
+    # assignment, then relaxed fill: place what we can greedily, allowing the same subject
+    # twice per day; every session left over gets the reasons it could not be placed
+    if solved:
+        return Solution(placements=best, complete=True, nodes=budget.nodes, stopped=budget.stopped,
+                        stats=dict(budget.counters))
+    started = perf_counter()
+    sessions = problem.sessions
+    order = sorted(range(len(sessions)), key=lambda i: PRIORITY.get(sessions[i].kind, 3))
+    starts = {n: problem.starts(n) for n in {s.length for s in sessions}}
+    placements = best
+    state = _restore(problem, placements)
+    for i in order:
+        s = sessions[i]
+        if placements[i] is not None:
+            continue
+        if budget.expired():
+            break
+        for slot, mask, day_bit in starts[s.length]:
+            if not state.fits(s, mask):
+                continue
+            room = pick_room(problem, state, s, mask)
+            if room is None:
+                continue
+            state.place(s, mask, day_bit, room)
+            placements[i] = (slot, room)
+            break
+    reasons = {}
+    for i, placement in enumerate(placements):
+        if placement is None:
+            if budget.stopped in ("time_limit", "cancelled"):
+                reasons[i] = {budget.stopped: 1}
+            else:
+                reasons[i] = _why(problem, state, i, starts)
+    return Solution(
+        placements=placements,
+        complete=not reasons,
+        nodes=budget.nodes,
+        stopped=budget.stopped,
+        reasons=reasons,
+        stats=dict(budget.counters),
+        fill_ms=(perf_counter() - started) * 1000,
+    )
+
+
+class SearchSolver:
+    """The in-process tree searches: fixed-order backtracking or MRV with forward checking."""
+
+    def __init__(self, strategy: str):
+        self.name = strategy
+
+    def available(self) -> bool:
+        return True
+
+    def solve(self, problem: Problem, symmetry: bool = True, time_limit_ms: Optional[int] = None,
+              max_nodes: Optional[int] = None, on_progress=None, seed: Optional[int] = None) -> Solution:
+        sessions = problem.sessions
+        order = sorted(range(len(sessions)), key=lambda i: PRIORITY.get(sessions[i].kind, 3))
+        state = SlotState(problem)
+        placements = [None] * len(sessions)
+        budget = Budget(time_limit_ms, max_nodes, on_progress)
+        if self.name == "mrv":
+            solved, best = search_mrv(problem, state, placements, budget, symmetry)
+        else:
+            solved, best = _backtrack(problem, state, order, placements, budget, symmetry)
+        return finish(problem, solved, placements if solved else best, budget)
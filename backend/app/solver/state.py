@@ -0,0 +1,117 @@
+from typing import List
+from .problem import Problem, Session
+
+
+def iter_bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class SlotState:
+    """Occupancy of every teacher, room and division as one int bitmask each.
+
+    Bit ``day * periods + period`` is set when the slot is taken, so a session
+    fits when its slot mask does not intersect any of the three masks. Masks
+    start from the problem's blocked slots (breaks, other stored timetables,
+    teacher unavailability).
+
+    Rooms are also indexed the other way round: ``free[pool][slot]`` has bit k
+    set when the k-th room of the pool is free in that slot, so finding a room
+    for a span is a few ANDs however many rooms the pool holds.
+    """
+
+    __slots__ = ("teacher", "room", "division", "pair_days", "free", "room_bits")
+
+    def __init__(self, problem: Problem):
+        self.teacher: List[int] = list(problem.teacher_blocked) or [0] * len(problem.teacher_ids)
+        # availability is a domain reduction: unavailable slots start out taken
+        for t, mask in enumerate(problem.teacher_unavailable):
+            self.teacher[t] |= mask
+        self.room: List[int] = list(problem.room_blocked) or [0] * len(problem.room_ids)
+        self.division: List[int] = list(problem.division_blocked) or [0] * len(problem.division_ids)
+        # days already used by each (division, subject) pair, one bit per day
+        self.pair_days: List[int] = list(problem.pair_days) or [0] * len(problem.pairs)
+        # (pool, bit) of every pool a room belongs to
+        self.room_bits: List[List[tuple]] = [[] for _ in problem.room_ids]
+        self.free: List[List[int]] = []
+        for p, pool in enumerate(problem.pools):
+            row = [(1 << len(pool)) - 1] * problem.slots
+            for k, r in enumerate(pool):
+                self.room_bits[r].append((p, 1 << k))
+                for slot in iter_bits(self.room[r]):
+                    if slot < problem.slots:
+                        row[slot] &= ~(1 << k)
+            self.free.append(row)
+
+    def fits(self, session: Session, mask: int) -> bool:
+        if session.batches:
+            busy = self.division[session.division]
+            for t in session.teachers:
+                busy |= self.teacher[t]
+            return not (busy & mask)
+        return not ((self.teacher[session.teacher] | self.division[session.division]) & mask)
+
+    def room_free(self, room: int, mask: int) -> bool:
+        return not (self.room[room] & mask)
+
+    def free_in(self, pool: int, mask: int) -> int:
+        # pool positions of the rooms free over every slot of `mask`
+        row = self.free[pool]
+        avail = -1
+        for slot in iter_bits(mask):
+            avail &= row[slot]
+        return avail
+
+    def place(self, session: Session, mask: int, day_bit: int, room):
+        if session.batches:
+            for t in session.teachers:
+                self.teacher[t] |= mask
+            rooms = room
+        else:
+            self.teacher[session.teacher] |= mask
+            rooms = () if room is None else (room,)
+        self.division[session.division] |= mask
+        for r in rooms:
+            self.room[r] |= mask
+            for p, bit in self.room_bits[r]:
+                row = self.free[p]
+                for slot in iter_bits(mask):
+                    row[slot] &= ~bit
+        self.pair_days[session.pair] |= day_bit
+
+    def undo(self, session: Session, mask: int, day_bit: int, room):
+        if session.batches:
+            for t in session.teachers:
+                self.teacher[t] &= ~mask
+            rooms = room
+        else:
+            self.teacher[session.teacher] &= ~mask
+            rooms = () if room is None else (room,)
+        self.division[session.division] &= ~mask
+        for r in rooms:
+            self.room[r] &= ~mask
+            for p, bit in self.room_bits[r]:
+                row = self.free[p]
+                for slot in iter_bits(mask):
+                    row[slot] |= bit
+        self.pair_days[session.pair] &= ~day_bit
+
+
+def pick_room(problem: Problem, state: SlotState, session: Session, mask: int):
+    # first free room in pool order, so preferred and best-fitting rooms go first;
+    # a rotation group gets a tuple of distinct rooms, one per batch, or None
+    if session.batches:
+        rooms = []
+        for pool in session.pools:
+            room = next((r for r in (problem.pools[pool][k] for k in iter_bits(max(state.free_in(pool, mask), 0)))
+                         if r not in rooms), None)
+            if room is None:
+                return None
+            rooms.append(room)
+        return tuple(rooms)
+    avail = state.free_in(session.pool, mask)
+    if avail <= 0:
+        return None
+    return problem.pools[session.pool][(avail & -avail).bit_length() - 1]
@@ -0,0 +1,121 @@
+import cProfile
+import logging
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+from typing import Dict, Optional
+from .problem import Solution
+
+logger = logging.getLogger(__name__)
+
+# where opt-in cProfile captures (options.profile) are written; unset, profiling is refused
+PROFILE_DIR = os.getenv("SOLVER_PROFILE_DIR", "")
+
+
+class Trace:
+    """Wall time per phase of one generate or repair run, plus the solver's counters.
+
+    Phases are charged with ``lap``: each call books the time since the previous
+    one, so the pipeline only marks where a phase ends. A solve is split by
+    ``solved`` into the search proper and the relaxed fill that follows an
+    incomplete search.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.counters: Counter = Counter()
+        self.started = self._mark = perf_counter()
+
+    def lap(self, phase: str):
+        now = perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self._mark) * 1000
+        self._mark = now
+
+    def solved(self, solution: Solution):
+        # parallel components overlap, so the fill is capped at the solve's wall time
+        elapsed = (perf_counter() - self._mark) * 1000
+        fill = min(solution.fill_ms, elapsed)
+        self.phases["search"] = self.phases.get("search", 0.0) + elapsed - fill
+        if fill:
+            self.phases["relaxed_fill"] = self.phases.get("relaxed_fill", 0.0) + fill
+        self.counters["nodes"] += solution.nodes
+        self.counters.update(solution.stats)
+        self._mark = perf_counter()
+
+    @property
+    def total_ms(self) -> float:
+        return (self._mark - self.started) * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            "total_ms": round(self.total_ms, 2),
+            "phases_ms": {phase: round(ms, 2) for phase, ms in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+
+
+class Aggregate:
+    """Totals over every run this process finished, for the solver-stats endpoint.
+
+    Job workers are separate processes, so runs submitted as jobs are not included.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.since = datetime.utcnow()
+            self.runs: Counter = Counter()
+            self.phase_total: Counter = Counter()
+            self.phase_runs: Counter = Counter()
+            self.phase_max: Dict[str, float] = {}
+            self.counters: Counter = Counter()
+
+    def record(self, kind: str, trace: Trace):
+        with self._lock:
+            self.runs[kind] += 1
+            for phase, ms in trace.phases.items():
+                self.phase_total[phase] += ms
+                self.phase_runs[phase] += 1
+                self.phase_max[phase] = max(self.phase_max.get(phase, 0.0), ms)
+            self.counters.update(trace.counters)
+        logger.info("%s run in %.0f ms: %s", kind, trace.total_ms,
+                    ", ".join(f"{phase} {ms:.0f}" for phase, ms in trace.phases.items()))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "since": self.since.isoformat(),
+                "runs": dict(self.runs),
+                "phases_ms": {phase: {"total": round(total, 2), "mean": round(total / self.phase_runs[phase], 2),
+                                      "max": round(self.phase_max[phase], 2)}
+                              for phase, total in self.phase_total.items()},
+                "counters": dict(self.counters),
+            }
+
+
+STATS = Aggregate()
+
+
+@contextmanager
+def profiled(kind: str, enabled: bool):
+    # cProfile the block when asked; yields a dict whose "path" is the .prof file once written
+    out: Dict[str, Optional[str]] = {"path": None}
+    if not enabled:
+        yield out
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield out
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{kind}-{datetime.utcnow():%Y%m%d-%H%M%S-%f}-{os.getpid()}.prof")
+        profiler.dump_stats(path)
+        out["path"] = path
@@ -0,0 +1 @@
+# Solver benchmarks; run from backend/, e.g. `python -m benchmarks.deep_instance`
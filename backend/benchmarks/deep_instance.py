@@ -0,0 +1,20 @@
+"""Regression benchmark: a 1000+ session instance, deeper than Python's default recursion limit."""
+import sys
+import time
+
+from app.solver import STRATEGIES, solve
+from benchmarks.instances import synthetic_problem
+
+
+def main():
+    problem = synthetic_problem(divisions=40, subjects=6, hours=5, labs=1, lab_rooms=12)
+    print(f"sessions={len(problem.sessions)} recursionlimit={sys.getrecursionlimit()}")
+    for strategy in STRATEGIES:
+        t0 = time.perf_counter()
+        solution = solve(problem, strategy)
+        elapsed = time.perf_counter() - t0
+        print(f"{strategy:<10} complete={solution.complete} unplaced={len(solution.unplaced)} seconds={elapsed:.3f}")
+
+
+if __name__ == "__main__":
+    main()
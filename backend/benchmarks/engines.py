@@ -0,0 +1,32 @@
+"""Every available engine on the same generated instances: feasible, dense and infeasible ones."""
+import time
+
+from app.solver import STRATEGIES, solve
+from benchmarks.instances import synthetic_problem
+
+TIME_LIMIT_MS = 20000
+
+INSTANCES = {
+    # 40 divisions, comfortable rooms
+    "college-40": dict(divisions=40, subjects=6, hours=5, labs=1, lab_rooms=12),
+    # 8 divisions filling 42 of 48 periods each, teachers at full load, four lab rooms
+    "dense-8": dict(divisions=8, subjects=6, hours=6, labs=3, lab_rooms=4, teacher_load=3),
+    # 16 two-period labs share one lab room that has 15 two-period windows a week
+    "lab-room-short": dict(divisions=8, subjects=3, hours=4, labs=2, lab_rooms=1, days=5, periods=6),
+}
+
+
+def main():
+    print(f"engines={list(STRATEGIES)} time_limit_ms={TIME_LIMIT_MS}")
+    for name, kwargs in INSTANCES.items():
+        problem = synthetic_problem(**kwargs)
+        for strategy in STRATEGIES:
+            t0 = time.perf_counter()
+            solution = solve(problem, strategy, time_limit_ms=TIME_LIMIT_MS)
+            elapsed = time.perf_counter() - t0
+            print(f"{name:<15} sessions={len(problem.sessions):<5} {strategy:<10} complete={solution.complete!s:<5} "
+                  f"stopped={solution.stopped} unplaced={len(solution.unplaced)} nodes={solution.nodes} seconds={elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
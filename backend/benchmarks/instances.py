@@ -0,0 +1,37 @@
+from app.solver.problem import LAB, LECTURE, Problem, Session
+
+
+def synthetic_problem(divisions=40, subjects=6, hours=5, labs=0, lab_length=2,
+                      teacher_load=6, classrooms=None, lab_rooms=None,
+                      days=6, periods=8, twice_in_day=False) -> Problem:
+    # every division gets `subjects` lecture subjects of `hours` sessions plus `labs` lab subjects;
+    # each teacher covers `teacher_load` consecutive (division, subject) pairs
+    sessions, pairs, twice = [], [], []
+    n_pairs = divisions * (subjects + labs)
+    teachers = max(1, -(-n_pairs // teacher_load))
+    for d in range(divisions):
+        for k in range(subjects + labs):
+            pair = len(pairs)
+            subject_id = k + 1
+            pairs.append((d + 1, subject_id))
+            if twice_in_day:
+                twice.append(pair)
+            teacher = pair // teacher_load
+            if k < subjects:
+                sessions += [Session(d, subject_id, teacher, LECTURE, 1, pair, 0) for _ in range(hours)]
+            else:
+                sessions.append(Session(d, subject_id, teacher, LAB, lab_length, pair, 1))
+    classrooms = classrooms if classrooms is not None else divisions
+    lab_rooms = lab_rooms if lab_rooms is not None else max(1, divisions // 4) if labs else 0
+    rooms = classrooms + lab_rooms
+    return Problem(
+        days=days,
+        periods=periods,
+        sessions=sessions,
+        division_ids=list(range(1, divisions + 1)),
+        teacher_ids=list(range(1, teachers + 1)),
+        room_ids=list(range(1, rooms + 1)),
+        pools=[list(range(classrooms)), list(range(classrooms, rooms))],
+        twice_allowed=twice,
+        pairs=pairs,
+    )
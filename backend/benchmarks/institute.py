@@ -0,0 +1,100 @@
+"""Synthetic institutes written through the ORM, for benchmarks that run the whole generate pipeline."""
+import math
+import random
+from dataclasses import dataclass
+from typing import List
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.database import Base
+
+
+@dataclass
+class Institute:
+    department_ids: List[int]
+    class_ids: List[int]
+    teachers: int
+
+
+def memory_db():
+    # a fresh in-memory SQLite database with every table, on one shared connection
+    engine = create_engine("sqlite://", future=True, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, autoflush=False, future=True)()
+
+
+def synthetic_institute(db, departments=1, classes=2, divisions=3, subjects=6, labs=1, lab_hours=2,
+                        tightness=0.75, teacher_load=0.75, room_ratio=1.0, batches=0, mode="college",
+                        days=6, periods=8, strength=60, seed=42) -> Institute:
+    """Fill `db` with a department-shaped institute.
+
+    ``tightness`` is the share of each division's week its subjects take,
+    ``teacher_load`` the share of a week each teacher teaches at most and
+    ``room_ratio`` the classrooms per division. School classes get a
+    fixed classroom each, so school scenarios want one division per class
+    and ``room_ratio`` of at least 1. Teachers are handed
+    (division, subject) pairs in a seeded random order, so instances with the
+    same parameters are identical.
+    """
+    rng = random.Random(seed)
+    week = days * periods
+    lab_periods = labs * lab_hours
+    # a subject is taught at most once a day; leaving it a spare day keeps tight weeks solvable,
+    # so they get more subjects rather than more hours
+    subjects = max(subjects, math.ceil((tightness * week - lab_periods) / (days - 1)))
+    hours = max(1, round((tightness * week - lab_periods) / max(1, subjects)))
+    department_ids, class_ids, teachers = [], [], 0
+    for k in range(departments):
+        dept = models.Department(name=f"Dept {k + 1}")
+        db.add(dept)
+        db.flush()
+        department_ids.append(dept.id)
+        db.add(models.TimeConfig(department_id=dept.id, working_days=days, periods_per_day=periods))
+        n_divisions = classes * divisions
+        classrooms = max(1, math.ceil(n_divisions * room_ratio))
+        lab_rooms = max(1, math.ceil(n_divisions * lab_periods / week * 1.5)) if labs else 0
+        classroom_rows = [models.Room(department_id=dept.id, room_number=f"C{r + 1}", type=models.RoomType.classroom,
+                                      capacity=strength) for r in range(classrooms)]
+        db.add_all(classroom_rows)
+        # labs sized for a whole division still host a batch; a division that cannot rotate needs them
+        db.add_all(models.Room(department_id=dept.id, room_number=f"L{r + 1}", type=models.RoomType.lab,
+                               capacity=strength) for r in range(lab_rooms * max(1, batches)))
+        db.flush()
+        pairs = []
+        for c in range(classes):
+            cls = models.ClassGroup(name=f"Y{c + 1}", mode=mode, department_id=dept.id, number_of_divisions=divisions)
+            if mode == "school":
+                # school classes keep one fixed room, shared by all their divisions
+                cls.fixed_room_id = classroom_rows[c % classrooms].id
+            db.add(cls)
+            db.flush()
+            class_ids.append(cls.id)
+            subs = [models.Subject(name=f"S{s + 1}", type=models.SubjectType.lecture, class_id=cls.id, hours_per_week=hours)
+                    for s in range(subjects)]
+            subs += [models.Subject(name=f"LAB{s + 1}", type=models.SubjectType.lab, class_id=cls.id, hours_per_week=lab_hours)
+                     for s in range(labs)]
+            db.add_all(subs)
+            divs = [models.Division(name=f"Y{c + 1}{chr(65 + d)}", class_id=cls.id, index=d, batch_count=batches,
+                                    strength=strength) for d in range(divisions)]
+            db.add_all(divs)
+            db.flush()
+            for d in divs:
+                pairs += [(d.id, s.id, s.hours_per_week) for s in subs]
+        # each teacher takes pairs until the next one would pass teacher_load of the week
+        rng.shuffle(pairs)
+        cap = max(1, int(teacher_load * week))
+        teacher, load = None, cap
+        for division_id, subject_id, periods_owed in pairs:
+            if teacher is None or load + periods_owed > cap:
+                teachers += 1
+                teacher = models.Teacher(name=f"T{teachers}", department_id=dept.id, is_school=mode == "school")
+                db.add(teacher)
+                db.flush()
+                load = 0
+            db.add(models.SubjectTeacher(subject_id=subject_id, teacher_id=teacher.id, division_id=division_id))
+            load += periods_owed
+    db.commit()
+    return Institute(department_ids=department_ids, class_ids=class_ids, teachers=teachers)
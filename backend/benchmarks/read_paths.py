@@ -0,0 +1,201 @@
+"""Read endpoint latency and CPU per request: ORM objects through response models vs rendered rows.
+
+Both sides are FastAPI apps driven in-process over ASGI (no server, no HTTP
+client) against one in-memory SQLite database holding ``--rows`` teachers,
+rooms, subjects and timetables. "orm" serves the list endpoints the way they
+were written before the fast read path: every row hydrated as an ORM object
+and validated through the route's response model. "rows" is the app itself,
+returning a whole table as one page. Both must answer with the same JSON.
+Usage, from backend/:
+
+    python -m benchmarks.read_paths
+    python -m benchmarks.read_paths --rows 10000 --repeat 20 --out reads.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi import Depends, FastAPI
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import listing, models, schemas
+from app.database import get_db
+from app.main import app as rows_app
+from benchmarks.institute import memory_db
+
+ROWS = 10000
+REPEAT = 20
+# path, query string; the projection case only exists on the rows side
+CASES = [
+    ("/api/v1/teachers", ""),
+    ("/api/v1/rooms", ""),
+    ("/api/v1/subjects", ""),
+    ("/api/v1/timetable/list", ""),
+    ("/api/v1/teachers", "fields=id,name"),
+]
+
+
+def seed(db: Session, rows: int):
+    # `rows` of each listed table, written with Core in a few statements
+    dept = models.Department(name="Bench")
+    db.add(dept)
+    db.flush()
+    classes = [models.ClassGroup(name=f"Y{c + 1}", mode=models.ModeType.college, department_id=dept.id) for c in range(50)]
+    db.add_all(classes)
+    db.flush()
+    class_ids = [c.id for c in classes]
+    created = datetime(2026, 1, 1)
+    db.execute(insert(models.Teacher), [
+        {"name": f"Teacher {i}", "email": f"t{i}@example.com", "department_id": dept.id, "is_school": i % 2 == 0}
+        for i in range(rows)])
+    db.execute(insert(models.Room), [
+        {"room_number": f"R{i}", "floor": str(i % 5), "department_id": dept.id,
+         "type": (models.RoomType.lab if i % 4 == 0 else models.RoomType.classroom), "capacity": 60}
+        for i in range(rows)])
+    db.execute(insert(models.Subject), [
+        {"name": f"Subject {i}", "type": models.SubjectType.lecture, "class_id": class_ids[i % len(class_ids)],
+         "hours_per_week": 3} for i in range(rows)])
+    db.execute(insert(models.Timetable), [
+        {"name": f"TT {i}", "class_id": class_ids[i % len(class_ids)], "department_id": dept.id,
+         "mode": models.ModeType.college, "published": i % 3 == 0, "created_at": created + timedelta(minutes=i)}
+        for i in range(rows)])
+    db.commit()
+
+
+def orm_app() -> FastAPI:
+    # the list endpoints as they were before the fast read path
+    legacy = FastAPI()
+
+    @legacy.get("/api/v1/teachers", response_model=List[schemas.TeacherOut])
+    def list_teachers(db: Session = Depends(get_db)):
+        return db.query(models.Teacher).all()
+
+    @legacy.get("/api/v1/rooms", response_model=List[schemas.RoomOut])
+    def list_rooms(db: Session = Depends(get_db)):
+        return db.query(models.Room).all()
+
+    @legacy.get("/api/v1/subjects", response_model=List[schemas.SubjectOut])
+    def list_subjects(db: Session = Depends(get_db)):
+        return db.query(models.Subject).all()
+
+    @legacy.get("/api/v1/timetable/list")
+    def list_timetables(db: Session = Depends(get_db)):
+        items = db.query(models.Timetable).all()
+        class_ids = {i.class_id for i in items}
+        classes = {c.id: c for c in db.query(models.ClassGroup).filter(models.ClassGroup.id.in_(class_ids)).all()}
+        return [{
+            "id": i.id,
+            "name": i.name,
+            "class_id": i.class_id,
+            "class_name": classes[i.class_id].name if i.class_id in classes else None,
+            "department_id": i.department_id,
+            "mode": i.mode.value,
+            "is_published": bool(i.published),
+            "created_at": i.created_at.isoformat() if i.created_at else None,
+        } for i in items]
+
+    return legacy
+
+
+def get(loop, app, path: str, query: str) -> bytes:
+    # one GET through the ASGI app; returns the body
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query.encode(),
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    loop.run_until_complete(app(scope, receive, send))
+    status = next(m["status"] for m in messages if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+    if status != 200:
+        raise RuntimeError(f"GET {path}?{query}: {status} {body[:200]!r}")
+    return body
+
+
+def measure(loop, app, path: str, query: str, repeat: int) -> dict:
+    body = get(loop, app, path, query)  # warm up
+    wall, cpu = [], []
+    for _ in range(repeat):
+        t0, c0 = time.perf_counter(), time.process_time()
+        get(loop, app, path, query)
+        wall.append((time.perf_counter() - t0) * 1000)
+        cpu.append((time.process_time() - c0) * 1000)
+    return {
+        "median_ms": round(statistics.median(wall), 2),
+        "p90_ms": round(sorted(wall)[int(0.9 * (len(wall) - 1))], 2),
+        "cpu_ms": round(statistics.mean(cpu), 2),
+        "bytes": len(body),
+        "body": body,
+    }
+
+
+def run(rows: int, repeat: int) -> dict:
+    db = memory_db()
+    seed(db, rows)
+    listing.LIST_MAX_LIMIT = rows  # the whole table as one page, like the unpaginated endpoints
+    apps = {"orm": orm_app(), "rows": rows_app}
+    for app in apps.values():
+        app.dependency_overrides[get_db] = lambda: db
+    loop = asyncio.new_event_loop()
+    results = []
+    try:
+        for path, query in CASES:
+            measured = {side: measure(loop, app, path, query, repeat)
+                        for side, app in apps.items() if side == "rows" or not query}
+            bodies = [json.loads(m.pop("body")) for m in measured.values()]
+            if any(b != bodies[0] for b in bodies):
+                raise RuntimeError(f"{path}: orm and rows answer differently")
+            row = {"endpoint": path + (f"?{query}" if query else ""), **measured}
+            if "orm" in measured:
+                row["speedup"] = round(measured["orm"]["median_ms"] / measured["rows"]["median_ms"], 2)
+            results.append(row)
+            print(" ".join(f"{k}={v}" for k, v in row.items()), file=sys.stderr)
+    finally:
+        loop.close()
+        for app in apps.values():
+            app.dependency_overrides.clear()
+        db.close()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "rows": rows,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=ROWS, help="rows per listed table")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed requests per endpoint and side")
+    parser.add_argument("--out", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    text = json.dumps(run(args.rows, args.repeat), indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
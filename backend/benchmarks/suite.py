@@ -0,0 +1,171 @@
+"""End-to-end generate benchmarks on synthetic institutes, as JSON that can be compared between commits.
+
+Each scenario builds an institute in a fresh in-memory SQLite database and
+runs the generate pipeline outside FastAPI, once timed and once under
+tracemalloc for the peak Python heap (native solver memory is not
+traced). Usage, from backend/:
+
+    python -m benchmarks.suite --out before.json
+    python -m benchmarks.suite --out after.json --compare before.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from app import schemas
+from app.solver import STRATEGIES, invalidate_occupancy
+from app.solver.pipeline import generate_department, generate_timetables
+from app.solver.precheck import InfeasibleInput
+from benchmarks.institute import memory_db, synthetic_institute
+
+# name -> synthetic_institute parameters; "department" runs generate-department over every class
+SCENARIOS = {
+    "small": dict(classes=2, divisions=2, tightness=0.6),
+    "medium": dict(classes=3, divisions=3, tightness=0.75),
+    "tight": dict(classes=2, divisions=3, tightness=0.9, teacher_load=0.9, room_ratio=0.95),
+    "college-batches": dict(classes=2, divisions=2, labs=3, batches=3, tightness=0.75),
+    "school": dict(classes=6, divisions=1, labs=0, mode="school", tightness=0.8),
+    "department": dict(classes=4, divisions=3, tightness=0.7),
+}
+TIME_LIMIT_MS = 20000
+# a run regresses when it loses completeness or takes this much longer (or more nodes)
+TOLERANCE = 1.25
+# timings closer than this are noise on a shared machine
+MIN_WALL_MS = 50
+
+
+def _run(name: str, params: dict, strategy: str, time_limit_ms: int) -> dict:
+    db = memory_db()
+    try:
+        institute = synthetic_institute(db, **params)
+        # department ids repeat across the fresh databases: drop any occupancy index of a previous run
+        for department_id in institute.department_ids:
+            invalidate_occupancy(department_id)
+        options = {"strategy": strategy, "time_limit_ms": time_limit_ms, "occupancy": "none", "cache": False}
+        t0 = time.perf_counter()
+        try:
+            if name == "department":
+                out = generate_department(db, schemas.DepartmentGenerateIn(
+                    name=name, department_id=institute.department_ids[0], options=options))
+            else:
+                # classes one after another, as a coordinator would generate them
+                outs = [generate_timetables(db, schemas.TimetableIn(
+                    name=name, class_id=c, department_id=institute.department_ids[0], mode=params.get("mode", "college"),
+                    options={**options, "occupancy": "all"})) for c in institute.class_ids]
+                out = {
+                    "sessions": sum(o["sessions"] for o in outs),
+                    "complete": all(o["complete"] for o in outs),
+                    "unplaced": [u for o in outs for u in o["unplaced"]],
+                    "nodes": sum(o["nodes"] for o in outs),
+                    "entries": sum(o["entries"] for o in outs),
+                    "stopped": next((o["stopped"] for o in outs if o["stopped"]), None),
+                }
+        except InfeasibleInput as exc:
+            out = {"sessions": 0, "complete": False, "unplaced": [], "nodes": 0, "entries": 0,
+                   "stopped": "precheck", "issues": len(exc.issues)}
+        wall_ms = (time.perf_counter() - t0) * 1000
+        return {
+            "sessions": out["sessions"],
+            "teachers": institute.teachers,
+            "complete": out["complete"],
+            "unplaced": len(out["unplaced"]),
+            "nodes": out["nodes"],
+            "entries": out["entries"],
+            "stopped": out["stopped"],
+            "wall_ms": round(wall_ms, 1),
+        }
+    finally:
+        db.close()
+
+
+def _peak_kb(name: str, params: dict, strategy: str, time_limit_ms: int) -> int:
+    tracemalloc.start()
+    try:
+        _run(name, params, strategy, time_limit_ms)
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run_suite(scenarios, strategies, time_limit_ms: int = TIME_LIMIT_MS, memory: bool = True) -> dict:
+    results = []
+    for name in scenarios:
+        for strategy in strategies:
+            row = {"scenario": name, "strategy": strategy, **_run(name, SCENARIOS[name], strategy, time_limit_ms)}
+            if memory:
+                row["peak_kb"] = _peak_kb(name, SCENARIOS[name], strategy, time_limit_ms)
+            results.append(row)
+            print(" ".join(f"{k}={v}" for k, v in row.items()), file=sys.stderr)
+    return {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "time_limit_ms": time_limit_ms,
+        },
+        "results": results,
+    }
+
+
+def compare(old: dict, new: dict, tolerance: float = TOLERANCE) -> list:
+    # regressions of `new` against `old`, matched on (scenario, strategy)
+    before = {(r["scenario"], r["strategy"]): r for r in old["results"]}
+    found = []
+    for r in new["results"]:
+        b = before.get((r["scenario"], r["strategy"]))
+        if b is None:
+            continue
+        key = f"{r['scenario']}/{r['strategy']}"
+        if b["complete"] and not r["complete"]:
+            found.append(f"{key}: no longer complete ({r['unplaced']} unplaced)")
+        for field in ("wall_ms", "nodes", "peak_kb"):
+            if field == "wall_ms" and r[field] - b[field] < MIN_WALL_MS:
+                continue
+            if field in b and field in r and b[field] and r[field] > b[field] * tolerance:
+                found.append(f"{key}: {field} {b[field]} -> {r[field]} ({r[field] / b[field]:.2f}x)")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="default: all")
+    parser.add_argument("--strategy", action="append", choices=STRATEGIES, help="default: every available engine")
+    parser.add_argument("--time-limit-ms", type=int, default=TIME_LIMIT_MS)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--out", help="write the JSON here instead of stdout")
+    parser.add_argument("--compare", help="an earlier JSON output; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    report = run_suite(args.scenario or list(SCENARIOS), args.strategy or list(STRATEGIES),
+                       args.time_limit_ms, memory=not args.no_memory)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
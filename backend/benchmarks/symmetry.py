@@ -0,0 +1,21 @@
+"""Nodes explored on an infeasible instance with and without symmetry breaking."""
+import time
+
+from app.solver import STRATEGIES, solve
+from benchmarks.instances import synthetic_problem
+
+
+def main():
+    # one teacher owes 10 periods to two divisions but the week only has 9 slots
+    problem = synthetic_problem(divisions=2, subjects=1, hours=5, teacher_load=2, days=3, periods=3, twice_in_day=True)
+    print(f"sessions={len(problem.sessions)} slots={problem.slots}")
+    for strategy in STRATEGIES:
+        for symmetry in (False, True):
+            t0 = time.perf_counter()
+            solution = solve(problem, strategy, symmetry=symmetry)
+            elapsed = time.perf_counter() - t0
+            print(f"{strategy:<10} symmetry={symmetry!s:<5} complete={solution.complete} nodes={solution.nodes} seconds={elapsed:.3f}")
+
+
+if __name__ == "__main__":
+    main()
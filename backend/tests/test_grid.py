@@ -0,0 +1,22 @@
+from app import models, schemas
+from app.grid import DAYS, build_grid
+from app.solver import invalidate_occupancy
+from app.solver.pipeline import generate_department
+from benchmarks.institute import memory_db, synthetic_institute
+
+
+def test_grid_holds_every_configured_period():
+    db = memory_db()
+    institute = synthetic_institute(db, classes=1, divisions=1, periods=10)
+    invalidate_occupancy(institute.department_ids[0])
+    generate_department(db, schemas.DepartmentGenerateIn(
+        name="ten periods", department_id=institute.department_ids[0],
+        options={"time_limit_ms": 5000, "occupancy": "none", "cache": False}))
+    tt = db.query(models.Timetable).first()
+    entries = db.query(models.TimetableEntry).filter(models.TimetableEntry.timetable_id == tt.id).all()
+    assert any(e.period_index >= 8 for e in entries)
+
+    grid = build_grid(db, tt.id)["grid"]
+    assert all(list(grid[day]) == [str(p) for p in range(10)] for day in DAYS)
+    filled = sum(1 for day in DAYS for cell in grid[day].values() if cell)
+    assert filled == len({(e.day_index, e.period_index) for e in entries})
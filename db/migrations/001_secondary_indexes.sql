@@ -0,0 +1,23 @@
+-- Secondary indexes for the hot read paths (see backend/app/models.py)
+--
+-- The backend adds any missing index at startup (database.init_db), which holds
+-- a large timetable_entries table while it builds. On a big existing MySQL
+-- database run this first instead: InnoDB builds each index online, without
+-- blocking reads or writes. Statements fail on an index that already exists,
+-- so drop those lines when re-running.
+
+USE timetable_db;
+
+-- division, teacher and room views of timetable entries
+CREATE INDEX ix_entries_division_slot ON timetable_entries (division_id, day_index, period_index) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX ix_entries_teacher_slot ON timetable_entries (teacher_id, day_index, period_index) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX ix_entries_room_slot ON timetable_entries (room_id, day_index, period_index) ALGORITHM=INPLACE LOCK=NONE;
+
+-- a teacher's subjects, a division's assignments, a class's subjects
+CREATE INDEX ix_subject_teachers_teacher ON subject_teachers (teacher_id) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX ix_subject_teachers_division ON subject_teachers (division_id, subject_id) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX ix_subjects_class_id ON subjects (class_id) ALGORITHM=INPLACE LOCK=NONE;
+
+-- occupancy per department, sibling timetables per class
+CREATE INDEX ix_timetables_department ON timetables (department_id, published) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX ix_timetables_class ON timetables (class_id, published) ALGORITHM=INPLACE LOCK=NONE;
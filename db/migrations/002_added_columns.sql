@@ -0,0 +1,20 @@
+-- Columns added to existing tables (see backend/app/models.py)
+--
+-- The backend adds any missing column at startup (database.init_db), as it does
+-- indexes. Run this first to add them ahead of a deploy instead: InnoDB adds each
+-- column in place without copying the table. Statements fail on a column that
+-- already exists, so drop those lines when re-running.
+
+USE timetable_db;
+
+-- session kind a room is offered to first, seeded with the room numbers the allocator used to hardcode
+ALTER TABLE rooms ADD COLUMN preferred_for ENUM('lecture','lab','tutorial') NULL, ALGORITHM=INSTANT;
+UPDATE rooms SET preferred_for = 'lab' WHERE room_number IN ('103', '104');
+UPDATE rooms SET preferred_for = 'tutorial' WHERE room_number = '105';
+UPDATE rooms SET preferred_for = 'lecture' WHERE room_number IN ('101', '102');
+
+-- students per division; rooms with a smaller capacity are skipped
+ALTER TABLE divisions ADD COLUMN strength INTEGER NULL, ALGORITHM=INSTANT;
+
+-- bumped by every write a rendered grid must reflect
+ALTER TABLE timetables ADD COLUMN grid_version INTEGER DEFAULT 0, ALGORITHM=INSTANT;
@@ -1,12 +1,23 @@
 import api from './api';
 
+// List endpoints return pages of at most LIST_MAX_LIMIT rows; follow the X-Next-Cursor header
+// until the last page, unless the caller asked for one page with `limit`
+const getAllPages = async (endpoint, params) => {
+  let response = await api.get(endpoint, { params });
+  let items = response.data;
+  while (!params.limit && response.headers['x-next-cursor']) {
+    response = await api.get(endpoint, { params: { ...params, cursor: response.headers['x-next-cursor'] } });
+    items = items.concat(response.data);
+  }
+  return items;
+};
+
 // Generic CRUD service factory
 const createCrudService = (baseEndpoint) => ({
   // Get all items with optional query parameters
   async getAll(params = {}) {
     try {
-      const response = await api.get(baseEndpoint, { params });
-      return response.data;
+      return await getAllPages(baseEndpoint, params);
     } catch (error) {
       throw error.response?.data || error.message;
     }
@@ -173,8 +184,7 @@ export const timetableService = {
   // Override generic CRUD methods to use correct timetable endpoints
   async getAll(params = {}) {
     try {
-      const response = await api.get('/timetable/list', { params });
-      return response.data;
+      return await getAllPages('/timetable/list', params);
     } catch (error) {
       throw error.response?.data || error.message;
     }